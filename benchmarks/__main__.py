@@ -0,0 +1,14 @@
+"""Run the command line tool with python -m benchmarks from the repository root.
+
+See cli.py for the commands.
+"""
+
+from pathlib import Path
+import sys
+
+# The scripts import each other as top-level modules, like when run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cli import main  # noqa: E402
+
+main(prog="python -m benchmarks")
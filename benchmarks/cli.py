@@ -0,0 +1,260 @@
+"""Drive the Abfallplus API client outside of Home Assistant.
+
+Runs the assistant or a pickup fetch against the live API or a recorded
+fixture directory:
+
+    python benchmarks/cli.py assistant [--app NAME] ...
+    python benchmarks/cli.py fetch --config entry.json
+    python benchmarks/cli.py --fixtures DIR fetch
+    python benchmarks/cli.py --record DIR assistant
+
+From the repository root, python -m benchmarks runs it as well.
+
+A fixture directory holds one file per API path (see fixture_name in
+replay.py) and the entry configuration as entry.json. Record
+mode writes such a directory from the responses of the live API, which it
+forwards through a local RecordingServer.
+
+The modules of the API client are loaded by path like in run.py, so Home
+Assistant does not have to be installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import cProfile
+import json
+import logging
+from pathlib import Path
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+
+import aiohttp
+
+from replay import RecordingServer, ReplayServer
+from run import _load, abfallplus_app_lib
+
+BASE_URL = abfallplus_app_lib.BASE_URL
+DNS_CACHE_TTL = abfallplus_app_lib.DNS_CACHE_TTL
+LIMIT_PER_HOST = abfallplus_app_lib.LIMIT_PER_HOST
+AbfallplusApp = abfallplus_app_lib.AbfallplusApp
+load_app_registry = abfallplus_app_lib.load_app_registry
+SearchIndex = _load("search").SearchIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+ENTRY_FILE = "entry.json"
+
+# Lists longer than this are searched before choosing from them
+SEARCH_THRESHOLD = 50
+
+
+def _entry_json(config: dict) -> str:
+    """Return an entry configuration as JSON, without the login cookies."""
+    config = copy.deepcopy(config)
+    for address in config.get("addresses", [config]):
+        address["cookie"] = None
+    return json.dumps(config, indent=2, ensure_ascii=False)
+
+
+def _choose(label: str, items: list[dict], name: str | None) -> dict | None:
+    """Return the item with the given name or ask for one on the terminal."""
+    if not items:
+        return None
+    by_name = {item["name"]: item for item in items}
+    if name is not None:
+        if name not in by_name:
+            raise SystemExit(f"Unknown {label} {name!r}")
+        return by_name[name]
+    candidates = items
+    if len(items) > SEARCH_THRESHOLD:
+        index = SearchIndex(items)
+        while not (candidates := index.search(input(f"Search {label}: "))):
+            print("No match")
+    for number, item in enumerate(candidates, 1):
+        print(f"{number:4}  {item['name']}")
+    return candidates[int(input(f"Choose {label} [1-{len(candidates)}]: ")) - 1]
+
+
+async def run_assistant(
+    args: argparse.Namespace,
+    session: aiohttp.ClientSession,
+    base_url: str,
+    quiet: bool,
+) -> dict:
+    """Run the assistant and return the resulting entry configuration."""
+    api = AbfallplusApp(session=session, base_url=base_url)
+    api.set_app(_choose("app", load_app_registry().apps, args.app))
+    api.set_community(
+        _choose("community", await api.get_communities() or [], args.community)
+    )
+    api.set_street(_choose("street", await api.get_streets() or [], args.street))
+    api.set_hnr(_choose("house number", await api.get_hnr() or [], args.hnr))
+
+    abfallarten = await api.get_abfallarten() or []
+    if args.abfallart:
+        selected = [_choose("waste type", abfallarten, a) for a in args.abfallart]
+    elif args.fixtures is not None or args.repeat > 1:
+        selected = abfallarten
+    else:
+        for number, abfallart in enumerate(abfallarten, 1):
+            print(f"{number:4}  {abfallart['name']}")
+        answer = input("Choose waste types [all]: ")
+        selected = [abfallarten[int(n) - 1] for n in answer.split()] or abfallarten
+    for abfallart in selected:
+        api.add_abfallart(abfallart)
+
+    config = await api.finalize_assistant()
+
+    # Check the configuration, which also records the pickup data
+    await _fetch_address(config, session, base_url, quiet)
+    return config
+
+
+async def run_fetch(
+    args: argparse.Namespace,
+    session: aiohttp.ClientSession,
+    base_url: str,
+    quiet: bool,
+) -> dict:
+    """Fetch the pickup times of an entry configuration and return it."""
+    config = json.loads(args.config.read_text())
+    # Config entries hold a list of addresses since version 2
+    for address in config.get("addresses", [config]):
+        await _fetch_address(address, session, base_url, quiet)
+    return config
+
+
+async def _fetch_address(
+    address: dict, session: aiohttp.ClientSession, base_url: str, quiet: bool
+) -> None:
+    """Fetch and print the next pickup times of an address."""
+    api = AbfallplusApp(copy.deepcopy(address), session=session, base_url=base_url)
+    pickups = await api.get_pickup_times()
+    if pickups is None:
+        raise SystemExit("Fetching the pickup times failed")
+    _LOGGER.info("Refresh statistics: %s", api.stats.as_dict())
+    if not quiet:
+        print(
+            json.dumps(
+                {
+                    name: [d.isoformat() for d in dates]
+                    for name, dates in pickups.items()
+                },
+                ensure_ascii=False,
+            )
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the command, repeatedly if asked to, and report the timings."""
+    server = None
+    base_url = args.base_url
+    if args.fixtures is not None:
+        server = ReplayServer.from_directory(args.fixtures)
+        base_url = await server.start()
+    elif args.record is not None:
+        server = RecordingServer(args.base_url)
+        base_url = await server.start()
+
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit_per_host=LIMIT_PER_HOST, ttl_dns_cache=DNS_CACHE_TTL
+        ),
+        cookie_jar=aiohttp.CookieJar(),
+    )
+    command = run_assistant if args.command == "assistant" else run_fetch
+    timings = []
+    try:
+        for run_number in range(args.repeat):
+            started = time.perf_counter()
+            config = await command(args, session, base_url, run_number > 0)
+            timings.append(time.perf_counter() - started)
+    finally:
+        await session.close()
+        if server is not None:
+            await server.stop()
+
+    if args.record is not None:
+        server.save(args.record)
+        (args.record / ENTRY_FILE).write_text(_entry_json(config))
+        print(f"Recorded {len(server.responses)} responses to {args.record}")
+    if args.command == "assistant":
+        if args.output is not None:
+            args.output.write_text(_entry_json(config))
+        else:
+            print(_entry_json(config))
+    if args.repeat > 1:
+        print(
+            f"{args.command}: median {statistics.median(timings) * 1000:.3f} ms"
+            f"  min {min(timings) * 1000:.3f} ms"
+            f"  {len(timings) / sum(timings):.2f} runs/s  n={len(timings)}"
+        )
+    if args.fixtures is not None:
+        print(f"bytes served: {server.bytes_sent}")
+
+
+def main(argv: list[str] | None = None, prog: str | None = None) -> None:
+    """Parse the command line and run the command."""
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__.split("\n", 1)[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--fixtures", type=Path, help="replay a fixture directory")
+    source.add_argument("--record", type=Path, help="record fixtures to a directory")
+    parser.add_argument("--base-url", default=BASE_URL, help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs")
+    parser.add_argument(
+        "--profile", action="store_true", help="print cProfile and memory statistics"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    assistant = commands.add_parser("assistant", help="run the setup assistant")
+    assistant.add_argument("--app")
+    assistant.add_argument("--community")
+    assistant.add_argument("--street")
+    assistant.add_argument("--hnr")
+    assistant.add_argument("--abfallart", action="append", help="repeatable")
+    assistant.add_argument(
+        "--output", type=Path, help="write the entry configuration to a file"
+    )
+
+    fetch = commands.add_parser("fetch", help="fetch the next pickup times")
+    fetch.add_argument("--config", type=Path, help=f"default: FIXTURES/{ENTRY_FILE}")
+
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.command == "fetch" and args.config is None:
+        if args.fixtures is None:
+            parser.error("fetch needs --config or --fixtures")
+        args.config = args.fixtures / ENTRY_FILE
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    if not args.profile:
+        asyncio.run(run(args))
+        return
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        asyncio.run(run(args))
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(25)
+        print(f"Memory high-water mark: {peak / 1024 / 1024:.3f} MiB", file=sys.stderr)
+        for stat in snapshot.statistics("lineno")[:10]:
+            print(stat, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Check the assistant list parsers against the expected entries.
+
+_extract_step_fertig must either return the entries BeautifulSoup finds
+or None, so that the BeautifulSoup parser is used instead:
+
+    python benchmarks/parity.py [--fixtures DIR]
+
+Every file in corpus/ has the expected entries next to it as JSON; files
+ending in .fallback.html must not take the fast path. The synthetic
+district and recorded assistant responses of a fixture directory are
+checked for agreement of both parsers as well.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import sys
+
+from run import abfallplus_app_lib
+from synthetic import make_district
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+FALLBACK_SUFFIX = ".fallback.html"
+
+_extract_step_fertig = abfallplus_app_lib._extract_step_fertig
+_parse_config_entries_soup = abfallplus_app_lib._parse_config_entries_soup
+
+
+def check(
+    name: str,
+    received_data: str,
+    fallback: bool | None,
+    expected: list[dict] | None = None,
+) -> bool:
+    """Check one response, which must (not) fall back if fallback is set.
+
+    Both parsers must return the expected entries if given, and agree
+    otherwise.
+    """
+
+    fast = _extract_step_fertig(received_data)
+    soup = _parse_config_entries_soup(received_data)
+    if expected is not None and soup != expected:
+        print(f"FAIL {name}:\n  soup:     {soup}\n  expected: {expected}")
+        return False
+    if fast is None:
+        if fallback is False:
+            print(f"FAIL {name}: fell back to BeautifulSoup")
+            return False
+        print(f"ok   {name}: falls back, {len(soup)} entries")
+        return True
+    if fallback:
+        print(f"FAIL {name}: took the fast path")
+        return False
+    if fast != soup:
+        print(f"FAIL {name}:\n  fast: {fast}\n  soup: {soup}")
+        return False
+    print(f"ok   {name}: {len(fast)} entries")
+    return True
+
+
+def main() -> None:
+    """Check the corpus, the synthetic district and recorded fixtures."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--fixtures", type=Path, help="recorded fixture directory")
+    args = parser.parse_args()
+
+    results = [
+        check(
+            path.name,
+            path.read_text(),
+            path.name.endswith(FALLBACK_SUFFIX),
+            json.loads(path.with_suffix(".json").read_text()),
+        )
+        for path in sorted(CORPUS_DIR.glob("*.html"))
+    ]
+    district = make_district(streets=50)
+    results.append(
+        check(
+            "synthetic assistent_strasse",
+            district["assistent_strasse"].decode(),
+            False,
+            [{"name": f"Straße {i}", "data": str(i)} for i in range(50)],
+        )
+    )
+    results.append(
+        check(
+            "synthetic assistent_abfallarten",
+            district["assistent_abfallarten"].decode(),
+            True,
+        )
+    )
+    if args.fixtures is not None:
+        results.extend(
+            check(str(path), path.read_text(), None)
+            for path in sorted(args.fixtures.glob("assistent_*"))
+        )
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
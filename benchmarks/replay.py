@@ -0,0 +1,163 @@
+"""Local stand-in for the Abfallplus app API replaying recorded responses."""
+
+from __future__ import annotations
+
+from collections import Counter
+import hashlib
+import logging
+from pathlib import Path
+
+from aiohttp import ClientSession, DummyCookieJar, web
+
+_LOGGER = logging.getLogger(__name__)
+
+COOKIE_NAME = "PHPSESSID"
+
+
+def fixture_name(path: str) -> str:
+    """Return the fixture file name of an API path.
+
+    Query strings and trailing slashes are ignored, so "login/" and
+    "version.xml?renew=1" map to "login" and "version.xml".
+    """
+
+    path = path.split("?", 1)[0].strip("/")
+    return path.replace("/", "_") or "index"
+
+
+class ReplayServer:
+    """Serve recorded API responses from a local aiohttp server."""
+
+    def __init__(self, responses: dict[str, bytes]) -> None:
+        """Initialize the server with response bodies keyed by fixture name."""
+
+        self.responses = responses
+        self.requests: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self._runner: web.AppRunner | None = None
+
+    @classmethod
+    def from_directory(cls, directory: str | Path) -> ReplayServer:
+        """Load all recorded responses of a fixture directory."""
+
+        return cls(
+            {
+                path.name: path.read_bytes()
+                for path in Path(directory).iterdir()
+                if path.is_file()
+            }
+        )
+
+    async def start(self, host: str = "localhost", port: int = 0) -> str:
+        """Start the server and return its base URL."""
+
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}/"
+
+    async def stop(self) -> None:
+        """Stop the server."""
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        """Answer a request with the recorded response of its path."""
+
+        await request.read()
+        name = fixture_name(request.path)
+        self.requests[name] += 1
+        if (body := self.responses.get(name)) is None:
+            _LOGGER.warning("No recorded response for %s", request.path)
+            return web.Response(status=404)
+
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        response = web.Response(body=body, headers={"ETag": etag})
+        if name == "config.xml":
+            response.set_cookie(COOKIE_NAME, "replay")
+        self.bytes_sent += len(body)
+        return response
+
+
+class RecordingServer(ReplayServer):
+    """Forward requests to the API and record the responses.
+
+    Point a client at the URL returned by start() and write the recorded
+    responses to a fixture directory with save().
+    """
+
+    # Response headers passed on to the client
+    FORWARDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+    def __init__(self, upstream: str) -> None:
+        """Initialize the server forwarding to the base URL upstream."""
+
+        super().__init__({})
+        self.upstream = upstream
+        self._session: ClientSession | None = None
+
+    async def start(self, host: str = "localhost", port: int = 0) -> str:
+        """Start the server and return its base URL."""
+
+        self._session = ClientSession(cookie_jar=DummyCookieJar())
+        return await super().start(host, port)
+
+    async def stop(self) -> None:
+        """Stop the server."""
+
+        await super().stop()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def save(self, directory: str | Path) -> None:
+        """Write the recorded responses to a fixture directory."""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, body in self.responses.items():
+            (directory / name).write_bytes(body)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        """Forward a request and record the body of its response."""
+
+        name = fixture_name(request.path)
+        self.requests[name] += 1
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in ("host", "content-length")
+        }
+        async with self._session.request(
+            request.method,
+            self.upstream + request.path_qs.lstrip("/"),
+            data=await request.read(),
+            headers=headers,
+        ) as resp:
+            body = await resp.read()
+            response = web.Response(
+                status=resp.status,
+                body=body,
+                headers={
+                    key: resp.headers[key]
+                    for key in self.FORWARDED_HEADERS
+                    if key in resp.headers
+                },
+            )
+            for cookie in resp.headers.getall("Set-Cookie", []):
+                response.headers.add("Set-Cookie", cookie)
+
+        # Not modified responses keep the body recorded before
+        if resp.status == 200:
+            self.responses[name] = body
+        self.bytes_sent += len(body)
+        return response
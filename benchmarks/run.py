@@ -0,0 +1,237 @@
+"""Offline benchmarks of the Abfallplus API client.
+
+Runs against a local stand-in of the Abfallplus API serving either a
+synthetic district or a recorded fixture directory:
+
+    python benchmarks/run.py [--streets 5000] [--repeat 20] [--zip deflated]
+    python benchmarks/run.py --fixtures DIR
+
+A fixture directory holds one file per API path (see fixture_name in
+replay.py) and the entry configuration as entry.json.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+import copy
+import importlib.util
+import io
+import json
+from pathlib import Path
+import plistlib
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from types import ModuleType
+import zipfile
+
+COMPONENT_DIR = (
+    Path(__file__).resolve().parent.parent / "custom_components" / "abfallplus"
+)
+
+
+def _load(name: str) -> ModuleType:
+    """Import a standalone module of the integration by path.
+
+    The integration directory cannot go on sys.path, as its calendar.py
+    would shadow the standard library module.
+    """
+
+    spec = importlib.util.spec_from_file_location(name, COMPONENT_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+abfallplus_app_lib = _load("abfallplus_app_lib")
+AbfallplusApp = abfallplus_app_lib.AbfallplusApp
+CHUNK_SIZE = abfallplus_app_lib.CHUNK_SIZE
+_PickupDatesParser = abfallplus_app_lib._PickupDatesParser
+
+from replay import ReplayServer  # noqa: E402
+from synthetic import COMPRESSIONS, make_config, make_district  # noqa: E402
+
+
+def _report(name: str, timings: list[float], unit: str = "ms") -> None:
+    """Print the summary of a benchmark."""
+
+    scale = 1000 if unit == "ms" else 1
+    print(
+        f"{name:<40} median {statistics.median(timings) * scale:9.3f} {unit}"
+        f"  min {min(timings) * scale:9.3f} {unit}  n={len(timings)}"
+    )
+
+
+async def _time_async(func: Callable[[], Awaitable], repeat: int) -> list[float]:
+    """Time an async callable."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _time_sync(func: Callable[[], object], repeat: int) -> list[float]:
+    """Time a sync callable."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def bench_refresh(config: dict, base_url: str, repeat: int) -> None:
+    """Full refresh latency, cold and with an unchanged version."""
+
+    async def cold() -> None:
+        app = AbfallplusApp(copy.deepcopy(config), base_url=base_url)
+        await app.get_pickup_times()
+        await app.close()
+
+    _report("refresh (cold)", await _time_async(cold, repeat))
+
+    app = AbfallplusApp(copy.deepcopy(config), base_url=base_url)
+    await app.get_pickup_times()
+    _report(
+        "refresh (version unchanged)",
+        await _time_async(app.get_pickup_times, repeat),
+    )
+    await app.close()
+
+    tracemalloc.start()
+    app = AbfallplusApp(copy.deepcopy(config), base_url=base_url)
+    await app.get_pickup_times()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await app.close()
+    print(f"{'refresh memory high-water mark':<40} {peak / 1024 / 1024:9.3f} MiB")
+
+
+def bench_plist(responses: dict[str, bytes], repeat: int) -> None:
+    """Throughput of parsing the structure plist."""
+
+    payload = responses["struktur.xml.zip"]
+
+    def load() -> None:
+        data = payload
+        if zipfile.is_zipfile(io.BytesIO(payload)):
+            with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+                data = archive.read(archive.namelist()[0])
+        plistlib.loads(data, fmt=plistlib.FMT_XML)
+
+    timings = _time_sync(load, repeat)
+    _report("plist parse", timings)
+    mib = len(payload) / 1024 / 1024
+    print(
+        f"{'plist parse throughput':<40} {mib / statistics.median(timings):9.3f} MiB/s"
+    )
+
+    def streaming() -> None:
+        parser = _PickupDatesParser()
+        for start in range(0, len(payload), CHUNK_SIZE):
+            parser.feed(payload[start : start + CHUNK_SIZE])
+        parser.close()
+
+    timings = _time_sync(streaming, repeat)
+    _report("streaming dates parse", timings)
+    print(
+        f"{'streaming parse throughput':<40} "
+        f"{mib / statistics.median(timings):9.3f} MiB/s"
+    )
+
+
+def bench_parse_entries(responses: dict[str, bytes], repeat: int) -> None:
+    """Parsing of the street list of the assistant."""
+
+    app = AbfallplusApp(make_config())
+    streets = responses["assistent_strasse"].decode()
+    _report(
+        "_parseConfigEntries (streets)",
+        _time_sync(lambda: app._parseConfigEntries(streets), repeat),
+    )
+
+
+# Modules that must not be imported when the API client is loaded
+DEFERRED_MODULES = ("bs4", "dateutil", "babel", "plistlib")
+
+IMPORT_SCRIPT = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("abfallplus_app_lib", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps([time.perf_counter() - started, sorted(sys.modules)]))
+"""
+
+
+def bench_import(repeat: int) -> bool:
+    """Import time of the API client in a fresh interpreter.
+
+    Returns False if any of the deferred modules got imported.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                IMPORT_SCRIPT,
+                str(COMPONENT_DIR / "abfallplus_app_lib.py"),
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        duration, modules = json.loads(output)
+        timings.append(duration)
+    _report("import abfallplus_app_lib", timings)
+    if loaded := [m for m in DEFERRED_MODULES if m in modules]:
+        print(f"ERROR: imported on load: {', '.join(loaded)}")
+        return False
+    return True
+
+
+async def main() -> None:
+    """Run all benchmarks."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--streets", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--zip", choices=sorted(COMPRESSIONS), help="zip the synthetic structure"
+    )
+    parser.add_argument("--fixtures", type=Path, help="recorded fixture directory")
+    args = parser.parse_args()
+
+    if not bench_import(min(args.repeat, 5)):
+        sys.exit(1)
+
+    if args.fixtures is not None:
+        server = ReplayServer.from_directory(args.fixtures)
+        config = json.loads((args.fixtures / "entry.json").read_text())
+    else:
+        server = ReplayServer(make_district(args.streets, compression=args.zip))
+        config = make_config()
+    base_url = await server.start()
+    try:
+        await bench_refresh(config, base_url, args.repeat)
+        bench_plist(server.responses, args.repeat)
+        if "assistent_strasse" in server.responses:
+            bench_parse_entries(server.responses, args.repeat)
+    finally:
+        await server.stop()
+    print(f"{'bytes served':<40} {server.bytes_sent}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
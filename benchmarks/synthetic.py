@@ -0,0 +1,137 @@
+"""Synthetic Abfallplus district for offline benchmarks."""
+
+from __future__ import annotations
+
+import datetime
+import io
+import plistlib
+import zipfile
+
+CATEGORIES = ["3", "5", "7", "10", "12", "13", "17", "21"]
+
+# Compression methods of zipped struktur.xml.zip payloads
+COMPRESSIONS = {"deflated": zipfile.ZIP_DEFLATED, "stored": zipfile.ZIP_STORED}
+
+
+def _step_fertig_list(prefix: str, count: int) -> bytes:
+    """Return an assistant list of step_fertig entries."""
+
+    items = "".join(
+        f'<li class="item">\n  <a href="#" onclick="step_fertig('
+        f"'{i}','{prefix} {i}');\">{prefix} {i}</a>\n</li>\n"
+        for i in range(count)
+    )
+    return f"<ul>\n{items}</ul>\n".encode()
+
+
+def _abfallarten_list() -> bytes:
+    """Return the waste type checkbox list of the assistant."""
+
+    items = "".join(
+        f'<li>\n<input id="f_id_abfallart_{c}" type="checkbox"/>Abfall{c}</li>\n'
+        for c in CATEGORIES
+    )
+    return f"<ul>\n{items}</ul>\n".encode()
+
+
+def make_struktur(
+    streets: int = 5000, years: int = 2, start: datetime.date | None = None
+) -> bytes:
+    """Return a struktur.xml.zip plist for a district of the given size.
+
+    Every category gets a pickup every two weeks; the street list stands in
+    for the structure metadata that makes up most of the real payload.
+    """
+
+    if start is None:
+        start = datetime.date.today().replace(month=1, day=1)
+    dates = [
+        {
+            "category_id": f"{n}-{category}",
+            "pickup_date": (start + datetime.timedelta(days=day + n)).isoformat(),
+        }
+        for n, category in enumerate(CATEGORIES)
+        for day in range(0, 365 * years, 14)
+    ]
+    dates.sort(key=lambda d: d["pickup_date"])
+    structure = {
+        "strassen": [
+            {"id": str(i), "name": f"Straße {i}", "kommune_id": str(i % 40)}
+            for i in range(streets)
+        ],
+        "dates": dates,
+    }
+    return plistlib.dumps(structure, fmt=plistlib.FMT_XML)
+
+
+class _Unseekable:
+    """Write-only stream, which makes zipfile write data descriptors."""
+
+    def __init__(self, stream: io.BytesIO) -> None:
+        self._stream = stream
+
+    def write(self, data: bytes) -> int:
+        return self._stream.write(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def zip_payload(payload: bytes, compression: str, descriptor: bool = False) -> bytes:
+    """Return the payload as the only member of a zip archive.
+
+    With descriptor, the sizes follow the member data, as written by
+    streaming zip writers, instead of preceding it in the local header.
+    """
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(
+        _Unseekable(buffer) if descriptor else buffer,
+        "w",
+        compression=COMPRESSIONS[compression],
+    ) as archive:
+        archive.writestr("struktur.xml", payload)
+    return buffer.getvalue()
+
+
+def make_district(
+    streets: int = 5000, years: int = 2, compression: str | None = None
+) -> dict[str, bytes]:
+    """Return all recorded responses of a synthetic district.
+
+    The structure plist is served as is, or zipped with the given method.
+    """
+
+    struktur = make_struktur(streets, years)
+    if compression is not None:
+        struktur = zip_payload(struktur, compression)
+    return {
+        "config.xml": b"<config/>",
+        "login": b"OK",
+        "version.xml": b"<version>1</version>",
+        "struktur.xml.zip": struktur,
+        "assistent_kommune": _step_fertig_list("Kommune", 40),
+        "assistent_strasse": _step_fertig_list("Straße", streets),
+        "assistent_hnr": _step_fertig_list("Nr", 200),
+        "assistent_abfallarten": _abfallarten_list(),
+        "assistent_finish": b"OK|Yeah",
+    }
+
+
+def make_config() -> dict:
+    """Return an entry configuration matching the synthetic district."""
+
+    return {
+        "client_id": "benchmark",
+        "cookie": None,
+        "app": {
+            "name": "Synthetic",
+            "app_id": "de.k4systems.synthetic",
+            "landkreis_id": "1|0|Synthetic",
+            "bundesland_id": "1",
+        },
+        "community": {"name": "Kommune 1", "data": "1"},
+        "street": {"name": "Straße 1", "data": "1"},
+        "hnr": {"name": "Nr 1", "data": "1"},
+        "abfallarten": [{"name": f"Abfall{c}", "data": c} for c in CATEGORIES],
+    }
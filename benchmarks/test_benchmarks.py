@@ -0,0 +1,148 @@
+"""pytest-benchmark suite of the Abfallplus API client.
+
+Runs against the local stand-in of the Abfallplus API serving a synthetic
+district, like run.py:
+
+    pip install aiohttp beautifulsoup4 python-dateutil pytest pytest-benchmark
+    pytest benchmarks --benchmark-only
+
+Compare runs with --benchmark-autosave and --benchmark-compare.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import tracemalloc
+
+import pytest
+from replay import ReplayServer
+from run import CHUNK_SIZE, AbfallplusApp, _PickupDatesParser
+from synthetic import CATEGORIES, COMPRESSIONS, make_config, make_district, zip_payload
+
+STREETS = 5000
+
+# The streaming parser keeps only the pickup dates, so the high-water mark
+# of a refresh must not grow with the district
+MEMORY_LIMIT = 2 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def loop():
+    """Event loop shared by the server and the benchmarked refreshes."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def district() -> dict[str, bytes]:
+    """Responses of a synthetic district."""
+    return make_district(STREETS)
+
+
+@pytest.fixture(scope="module")
+def base_url(loop, district):
+    """Base URL of a local server replaying the district."""
+    server = ReplayServer(district)
+    yield loop.run_until_complete(server.start())
+    loop.run_until_complete(server.stop())
+
+
+def _check_pickups(pickups: dict | None) -> None:
+    """Check the next pickups of the synthetic configuration."""
+    assert pickups is not None
+    assert sorted(pickups) == sorted(f"Abfall{c}" for c in CATEGORIES)
+    assert all(len(dates) == 2 for dates in pickups.values())
+
+
+def test_refresh_cold(benchmark, loop, base_url):
+    """Full refresh of a new app, including login and structure download."""
+
+    async def refresh():
+        app = AbfallplusApp(make_config(), base_url=base_url)
+        try:
+            return await app.get_pickup_times()
+        finally:
+            await app.close()
+
+    _check_pickups(benchmark(lambda: loop.run_until_complete(refresh())))
+
+
+def test_refresh_unchanged(benchmark, loop, base_url):
+    """Refresh with an unchanged version, answered from the cached schedule."""
+    app = AbfallplusApp(make_config(), base_url=base_url)
+    loop.run_until_complete(app.get_pickup_times())
+    try:
+        pickups = benchmark(lambda: loop.run_until_complete(app.get_pickup_times()))
+    finally:
+        loop.run_until_complete(app.close())
+    _check_pickups(pickups)
+    assert app.stats.cache_hits > 0
+
+
+def _parse(payload: bytes):
+    """Parse a structure payload chunk by chunk, like a refresh."""
+    parser = _PickupDatesParser()
+    for start in range(0, len(payload), CHUNK_SIZE):
+        parser.feed(payload[start : start + CHUNK_SIZE])
+    return parser.close()
+
+
+def test_plist_parse(benchmark, district):
+    """Streaming parse of the structure plist."""
+    payload = district["struktur.xml.zip"]
+    benchmark.extra_info["payload_bytes"] = len(payload)
+    assert benchmark(_parse, payload)
+
+
+@pytest.mark.parametrize("descriptor", [False, True])
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS))
+def test_plist_parse_zipped(benchmark, district, compression, descriptor):
+    """Streaming parse of the zipped structure plist."""
+    if compression == "stored" and descriptor:
+        pytest.skip("stored members need their size in the local header")
+    plist = district["struktur.xml.zip"]
+    payload = zip_payload(plist, compression, descriptor)
+    benchmark.extra_info["payload_bytes"] = len(payload)
+    assert benchmark(_parse, payload) == _parse(plist)
+
+
+def test_stored_zip_with_descriptor(district):
+    """Stored members with a data descriptor are rejected as such."""
+    payload = zip_payload(district["struktur.xml.zip"], "stored", descriptor=True)
+    with pytest.raises(ValueError, match="data descriptor"):
+        _parse(payload)
+
+
+def test_parse_entries(benchmark, district):
+    """Parsing of the street list of the assistant."""
+    app = AbfallplusApp(make_config())
+    streets = district["assistent_strasse"].decode()
+    entries = benchmark(app._parseConfigEntries, streets)
+    assert len(entries) == STREETS
+    assert entries[1] == {"name": "Straße 1", "data": "1"}
+
+
+@pytest.mark.parametrize("compression", [None, *sorted(COMPRESSIONS)])
+def test_refresh_memory(benchmark, loop, compression):
+    """High-water mark of the memory allocated by a cold refresh."""
+    server = ReplayServer(make_district(STREETS, compression=compression))
+    base_url = loop.run_until_complete(server.start())
+
+    def refresh():
+        app = AbfallplusApp(copy.deepcopy(make_config()), base_url=base_url)
+        tracemalloc.start()
+        try:
+            loop.run_until_complete(app.get_pickup_times())
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            loop.run_until_complete(app.close())
+
+    try:
+        peak = benchmark.pedantic(refresh, rounds=3)
+    finally:
+        loop.run_until_complete(server.stop())
+    benchmark.extra_info["peak_bytes"] = peak
+    assert peak < MEMORY_LIMIT
@@ -1,66 +1,429 @@
 """The Abfallplus integration."""
 
+import asyncio
+from collections.abc import Callable
 from datetime import timedelta
 import logging
+import random
+import secrets
+import time
+from typing import Any
 
-from babel import dates
+import voluptuous as vol
 
-from homeassistant.config_entries import ConfigEntry, ConfigEntryError
+from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import entity_registry as er
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.event import async_call_later, async_track_time_change
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.helpers.update_coordinator import (
+    REQUEST_REFRESH_DEFAULT_COOLDOWN,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
 
 from .abfallplus_app_lib import AbfallplusApp
-from .const import DOMAIN, ENTRY_COORDINATOR
+from .const import (
+    ATTR_ENTRY_ID,
+    CONF_ADDRESSES,
+    CONF_DATE_FORMAT,
+    CONF_FEED_TOKEN,
+    CONF_LOCALE,
+    CONF_MAX_CONCURRENT,
+    DEFAULT_DATE_FORMAT,
+    DEFAULT_LOCALE,
+    DEFAULT_MAX_CONCURRENT,
+    DOMAIN,
+    ENTRY_APPS,
+    ENTRY_COORDINATOR,
+    ENTRY_FEED,
+    ENTRY_FORMATTER,
+    ENTRY_REFRESH,
+    SERVICE_UPDATE_SENSORS,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .coordinator import AbfallplusCoordinator
+from .feed import AbfallplusFeedView, IcsFeed
+from .formatting import DateFormatter
+from .hub import async_get_hub
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS: list[Platform] = [Platform.SENSOR]
+PLATFORMS: list[Platform] = [Platform.CALENDAR, Platform.SENSOR]
+
+STORAGE_SAVE_DELAY = 10
+MIN_UPDATE_INTERVAL = timedelta(hours=3)
+MAX_UPDATE_INTERVAL = timedelta(days=2)
+STARTUP_REFRESH_SPREAD = 600
+UPDATE_INTERVAL_JITTER = 0.1
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+UPDATE_SENSORS_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_ENTRY_ID): vol.All(cv.ensure_list, [cv.string])}
+)
+
+
+class AbfallplusStore(Store):
+    """Persisted schedules of the addresses of an entry."""
+
+    async def _async_migrate_func(
+        self, old_major_version: int, old_minor_version: int, old_data: dict
+    ) -> dict:
+        """Migrate the stored schedules to the current version."""
+        if old_major_version == 1 and CONF_ADDRESSES not in old_data:
+            # Version 1 held the schedule of a single address, until
+            # entries got several addresses without a version bump
+            return {CONF_ADDRESSES: [old_data]}
+        return old_data
+
+
+def _jitter(interval: timedelta) -> timedelta:
+    """Randomize an interval so that instances do not poll in lockstep."""
+
+    return interval * random.uniform(1, 1 + UPDATE_INTERVAL_JITTER)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Abfallplus services."""
+
+    async def async_update_sensors(call: ServiceCall) -> ServiceResponse:
+        """Refresh the selected or all entries and report the results."""
+        entries = hass.data.get(DOMAIN, {})
+        entry_ids = call.data.get(ATTR_ENTRY_ID, list(entries))
+        if unknown := [entry_id for entry_id in entry_ids if entry_id not in entries]:
+            raise ServiceValidationError(
+                f"No loaded Abfallplus entry {', '.join(unknown)}"
+            )
+        results = await asyncio.gather(
+            *(entries[entry_id][ENTRY_REFRESH]() for entry_id in entry_ids)
+        )
+        return {"entries": dict(zip(entry_ids, results))}
+
+    hass.http.register_view(AbfallplusFeedView(hass))
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_UPDATE_SENSORS,
+        async_update_sensors,
+        schema=UPDATE_SENSORS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    return True
+
+
+def address_label(address: dict) -> str:
+    """Return the street and house number of an address configuration."""
+
+    if address["hnr"] is None:
+        return address["street"]["name"]
+    return f"{address['street']['name']} {address['hnr']['name']}"
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migrate an old config entry."""
+
+    if entry.version == 1:
+        # Version 1 entries held a single address
+        hass.config_entries.async_update_entry(
+            entry, data={CONF_ADDRESSES: [dict(entry.data)]}, version=2
+        )
+        _LOGGER.debug("Migrated config entry %s to version 2", entry.entry_id)
+    if entry.version == 2:
+        # Version 3 added the secret of the ICS feed
+        hass.config_entries.async_update_entry(
+            entry,
+            data={**entry.data, CONF_FEED_TOKEN: secrets.token_urlsafe(24)},
+            version=3,
+        )
+        _LOGGER.debug("Migrated config entry %s to version 3", entry.entry_id)
+    if entry.version == 3:
+        # Version 4 scoped the ids of the waste type sensors by entry, so
+        # that entries for the same address or waste type names can coexist
+        @callback
+        def async_migrate_unique_id(entity: er.RegistryEntry) -> dict | None:
+            if entity.domain != Platform.SENSOR or entity.unique_id.startswith(
+                entry.entry_id
+            ):
+                return None
+            return {"new_unique_id": f"{entry.entry_id}_{entity.unique_id}"}
+
+        await er.async_migrate_entries(hass, entry.entry_id, async_migrate_unique_id)
+        hass.config_entries.async_update_entry(entry, version=4)
+        _LOGGER.debug("Migrated config entry %s to version 4", entry.entry_id)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up SMA Sunny Beam from a config entry."""
+    """Set up Abfallplus from a config entry."""
+
+    store = AbfallplusStore(
+        hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id=entry.entry_id)
+    )
+    addresses = entry.data[CONF_ADDRESSES]
+    semaphore = asyncio.Semaphore(
+        entry.options.get(CONF_MAX_CONCURRENT, DEFAULT_MAX_CONCURRENT)
+    )
+
+    formatter = DateFormatter(
+        entry.options.get(CONF_LOCALE, DEFAULT_LOCALE),
+        entry.options.get(CONF_DATE_FORMAT, DEFAULT_DATE_FORMAT),
+    )
+    await hass.async_add_executor_job(formatter.load_locale)
+
+    def dump_schedules():
+        """Return the schedules of all addresses for persistence."""
+        return {CONF_ADDRESSES: [app.dump_schedule() for app in apps]}
+
+    async def async_format_data():
+        """Fill the formatting cache in one executor job if dates are missing."""
+        today = dt_util.now().date()
+        data = {
+            (index, name): dates
+            for index, app in enumerate(apps)
+            for name, dates in app.next_pickups(today=today).items()
+        }
+        if formatter.format_cached(data) is None:
+            await hass.async_add_executor_job(formatter.format, data)
+        return [app.schedule for app in apps]
 
-    abfallplus = AbfallplusApp(entry.data)
-    try:
-        await abfallplus.get_pickup_times()
-    except BaseException as err:
-        raise ConfigEntryError("Could not connect to Abfallplus") from err
+    async def async_fetch(index: int) -> bool | None:
+        """Fetch the schedule of one address, bounded by the semaphore.
+
+        Returns None if the fetch was skipped because the circuit is open.
+        """
+        async with semaphore:
+            if hub.circuit_open(keys[index]):
+                return None
+            return await hub.async_fetch(keys[index], origin=listeners[index])
+
+    def fetch_outcome(index: int, result, version_state) -> dict[str, Any]:
+        """Return the outcome of fetching an address for the service response."""
+        outcome: dict[str, Any] = {"address": address_label(addresses[index])}
+        if result is True:
+            outcome["result"] = "fetched"
+            outcome["changed"] = apps[index].version_state != version_state
+        elif result is None:
+            outcome["result"] = "skipped"
+            outcome["retry_in"] = round(hub.retry_delay(keys[index]))
+        else:
+            outcome["result"] = "failed"
+            outcome["error"] = str(result or "no data")
+        return outcome
+
+    poll_interval = MIN_UPDATE_INTERVAL
+    # Outcome per address of the last update, reported by update_sensors
+    fetch_outcomes: list[dict[str, Any]] = []
 
     async def async_update_data():
-        """Fetch data from API endpoint."""
-        try:
-            data = await abfallplus.get_pickup_times()
-        except BaseException as error:
-            raise UpdateFailed("Could not fetch data from Sunny Beam") from error
-        _LOGGER.debug("Data fetched from Sunny Beam: %s", data)
-
-        # Format dates
-        data_formatted = {}
-        for key, value in data.items():
-            dates_formaated = []
-            for date_unformated in value:
-                formated = await hass.async_add_executor_job(
-                    lambda d=date_unformated: dates.format_datetime(
-                        d, "EEE d. MMM", locale="de_DE"
-                    )
-                )
-                dates_formaated.append(formated)
-            data_formatted[key] = dates_formaated
-        return data_formatted
-
-    coordinator = DataUpdateCoordinator(
+        """Fetch data of all addresses from API endpoint."""
+        nonlocal poll_interval, fetch_outcomes
+        version_states = [app.version_state for app in apps]
+        results = await asyncio.gather(
+            *(async_fetch(index) for index in range(len(apps))),
+            return_exceptions=True,
+        )
+        fetch_outcomes = [
+            fetch_outcome(index, result, version_states[index])
+            for index, result in enumerate(results)
+        ]
+
+        # A failing address keeps serving its last known schedule and does
+        # not hold back the others.
+        failed = [index for index, result in enumerate(results) if result is not True]
+        for index in failed:
+            _LOGGER.warning(
+                "Could not fetch data of %s from Abfallplus, keeping the last "
+                "schedule: %s",
+                address_label(addresses[index]),
+                results[index] or "no data",
+            )
+        if all(app.schedule is None for app in apps):
+            error = next((r for r in results if isinstance(r, Exception)), None)
+            raise UpdateFailed("Could not fetch data from Abfallplus") from error
+        _LOGGER.debug(
+            "Data fetched from Abfallplus: %s", [app.version_state for app in apps]
+        )
+
+        # The schedule changes a few times a year, so back off while it
+        # stays the same and poll more often again once it changed.
+        if [app.version_state for app in apps] != version_states:
+            store.async_delay_save(dump_schedules, STORAGE_SAVE_DELAY)
+            poll_interval = MIN_UPDATE_INTERVAL
+        elif not failed:
+            poll_interval = min(poll_interval * 2, MAX_UPDATE_INTERVAL)
+        if failed:
+            # Retry the failed addresses with backoff
+            retry_delay = timedelta(
+                seconds=min(hub.retry_delay(keys[index]) for index in failed)
+            )
+            coordinator.update_interval = _jitter(min(retry_delay, poll_interval))
+        else:
+            coordinator.update_interval = _jitter(poll_interval)
+        return await async_format_data()
+
+    async def async_push_schedule():
+        """Take over a schedule downloaded for another entry."""
+        store.async_delay_save(dump_schedules, STORAGE_SAVE_DELAY)
+        coordinator.async_set_updated_data(await async_format_data())
+
+    @callback
+    def async_schedule_changed():
+        """Handle a schedule change fetched by another entry."""
+        entry.async_create_task(hass, async_push_schedule())
+
+    forced_refresh: asyncio.Task | None = None
+    forced_refresh_at = 0.0
+
+    async def async_run_forced_refresh() -> dict[str, Any]:
+        """Refresh all addresses, even if they were fetched just now."""
+        for key in keys:
+            hub.async_expire(key)
+        started = time.monotonic()
+        await coordinator.async_refresh()
+        result: dict[str, Any] = {
+            # Failed addresses keep their last schedule, so the coordinator
+            # rarely fails as a whole
+            "success": coordinator.last_update_success
+            and all(outcome["result"] == "fetched" for outcome in fetch_outcomes),
+            "duration": round(time.monotonic() - started, 3),
+            "addresses": fetch_outcomes,
+        }
+        if not coordinator.last_update_success:
+            result["error"] = str(coordinator.last_exception)
+        return result
+
+    async def async_force_refresh() -> dict[str, Any]:
+        """Force a refresh, joining one in flight or finished just before.
+
+        Rapid calls, e.g. from automations, result in one download.
+        """
+        nonlocal forced_refresh, forced_refresh_at
+        if forced_refresh is None or (
+            forced_refresh.done()
+            and time.monotonic() - forced_refresh_at >= REQUEST_REFRESH_DEFAULT_COOLDOWN
+        ):
+            forced_refresh_at = time.monotonic()
+            forced_refresh = entry.async_create_task(
+                hass, async_run_forced_refresh(), f"{DOMAIN} forced refresh"
+            )
+        return await asyncio.shield(forced_refresh)
+
+    async def async_advance_day():
+        """Format the dates moving into view before the entities show them."""
+        await async_format_data()
+        coordinator.async_update_listeners()
+
+    @callback
+    def async_midnight(now):
+        """Advance the next pickups locally when the day changes."""
+        if coordinator.data is not None:
+            entry.async_create_task(hass, async_advance_day(), f"{DOMAIN} advance day")
+
+    # Entries for the same client and address share their downloads. Each
+    # address subscribes with its own listener, which tells the hub which
+    # subscriber originated a fetch.
+    hub = async_get_hub(hass)
+    keys: list[tuple] = []
+    apps: list[AbfallplusApp] = []
+    listeners: list[Callable[[], None]] = []
+    for address in addresses:
+
+        @callback
+        def async_address_changed():
+            """Handle a schedule change of this address fetched elsewhere."""
+            async_schedule_changed()
+
+        key, app, unsubscribe = hub.async_subscribe(address, async_address_changed)
+        entry.async_on_unload(unsubscribe)
+        keys.append(key)
+        apps.append(app)
+        listeners.append(async_address_changed)
+
+    coordinator = AbfallplusCoordinator(
         hass,
         _LOGGER,
+        entry,
         name=ENTRY_COORDINATOR,
         update_method=async_update_data,
-        update_interval=timedelta(hours=1),
+        update_interval=_jitter(MIN_UPDATE_INTERVAL),
     )
 
-    await coordinator.async_refresh()
+    # Serve the schedules persisted by the last run and revalidate them in
+    # the background, so startup does not depend on the Abfallplus API.
+    if stored := await store.async_load():
+        for app, schedule in zip(apps, stored[CONF_ADDRESSES]):
+            if app.schedule is None:
+                app.restore_schedule(schedule)
+    if any(app.schedule is not None for app in apps):
+        coordinator.data = await async_format_data()
+
+        @callback
+        def async_startup_refresh(_now):
+            """Revalidate the stored schedules."""
+            entry.async_create_background_task(
+                hass, coordinator.async_refresh(), f"{DOMAIN} refresh {entry.entry_id}"
+            )
+
+        # Spread the revalidation of many instances started at the same time
+        entry.async_on_unload(
+            async_call_later(
+                hass, random.uniform(0, STARTUP_REFRESH_SPREAD), async_startup_refresh
+            )
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
+
+    entry.async_on_unload(
+        async_track_time_change(hass, async_midnight, hour=0, minute=0, second=0)
+    )
 
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = {ENTRY_COORDINATOR: coordinator}
+    hass.data[DOMAIN][entry.entry_id] = {
+        ENTRY_COORDINATOR: coordinator,
+        ENTRY_FORMATTER: formatter,
+        ENTRY_APPS: apps,
+        ENTRY_REFRESH: async_force_refresh,
+        ENTRY_FEED: IcsFeed(
+            hass, entry, coordinator, [address_label(a) for a in addresses]
+        ),
+    }
+
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry after its options changed."""
+
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        hass.data[DOMAIN].pop(entry.entry_id)
+    return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the persisted schedule of a deleted config entry."""
+
+    await AbfallplusStore(
+        hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id=entry.entry_id)
+    ).async_remove()
@@ -1,13 +1,27 @@
 # %%
+from array import array
 import asyncio
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
 import datetime
+import email.utils
+import functools
+import hashlib
+import html as html_lib
+import json
 import logging
-import plistlib as plist
+import math
+from pathlib import Path
+import re
+import struct
+import time
 import uuid
+from xml.parsers import expat
+import zlib
 
 import aiohttp
-from bs4 import BeautifulSoup
-from dateutil.parser import parse
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,18 +32,577 @@ HEADERS = {
 }
 BASE_URL = "https://app.abfallplus.de/"
 
+# Markup of the assistant lists that can be extracted without a DOM
+_INPUT_RE = re.compile(r"<input[\s>/]", re.IGNORECASE)
+_LI_RE = re.compile(r"<li[\s>/]", re.IGNORECASE)
+_ONCLICK_RE = re.compile(r"""\bonclick\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+
+# Registry of all known Abfallplus apps, shipped next to this module
+APPS_FILE = Path(__file__).parent / "apps.json"
+
+# Chunk size when streaming struktur.xml.zip
+CHUNK_SIZE = 64 * 1024
+
+# These response codes force a new login. Sessions without an explicit
+# cookie lifetime are kept until the API rejects them.
+AUTH_FAILED_STATUS = (401, 403)
+RATE_LIMITED_STATUS = (429, 503)
+
+# Pickups changed by at most this many days count as moved, not as removed
+# and added
+MOVE_WINDOW = 7
+
+# Connection pool tuning for sessions created by AbfallplusApp itself
+LIMIT_PER_HOST = 4
+DNS_CACHE_TTL = 3600
+
+
+class RateLimitedError(Exception):
+    """The API asked to retry later."""
+
+    def __init__(self, status: int, retry_after: float | None) -> None:
+        """Initialize with the seconds to wait from Retry-After, if any."""
+
+        super().__init__(f"Rate limited by Abfallplus ({status})")
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds to wait from a Retry-After header."""
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.UTC)
+    return max((retry_at - datetime.datetime.now(datetime.UTC)).total_seconds(), 0.0)
+
+
+def _parse_date(value) -> datetime.date:
+    """Parse a pickup date, trying the fixed ISO format first."""
+
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    try:
+        return datetime.date.fromisoformat(value[:10])
+    except ValueError:
+        # Deferred, dateutil is only needed for unusual date formats
+        from dateutil.parser import parse  # pylint: disable=import-outside-toplevel
+
+        return parse(value).date()
+
+
+def _step_fertig_entry(onclick: str) -> dict | None:
+    """Return the entry selected by a step_fertig('id','name') handler."""
+
+    start = onclick.find("step_fertig('")
+    end = onclick.rfind(")")
+    if start < 0 or end < start:
+        return None
+    onclick_split = onclick[start + 12 : end].replace("'", "").split(",")
+    if len(onclick_split) < 2:
+        return None
+    return {"name": onclick_split[1], "data": onclick_split[0]}
+
+
+def _extract_step_fertig(received_data: str) -> list | None:
+    """Extract step_fertig list entries without building a DOM.
+
+    Returns None if the markup is not a plain step_fertig list, in which
+    case the BeautifulSoup parser has to be used.
+    """
+
+    if _INPUT_RE.search(received_data):
+        return None
+    onclicks = [
+        html_lib.unescape(m.group(1) if m.group(1) is not None else m.group(2))
+        for m in _ONCLICK_RE.finditer(received_data)
+    ]
+    if len(onclicks) != len(_LI_RE.findall(received_data)):
+        return None
+
+    extracted_data = []
+    for onclick in onclicks:
+        if (entry := _step_fertig_entry(onclick)) is None:
+            return None
+        extracted_data.append(entry)
+    return extracted_data
+
+
+def _parse_config_entries_soup(received_data: str) -> list:
+    """Parse any assistant list with BeautifulSoup.
+
+    Must return the same entries as _extract_step_fertig wherever that
+    does not return None, see benchmarks/parity.py.
+    """
+
+    # Deferred, BeautifulSoup is only needed during the config flow
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    extracted_data = []
+    html = BeautifulSoup(received_data, "html.parser")
+
+    if not html.find("input"):
+        # Skip dividers and other entries without a step_fertig link
+        for li in html.find_all("li"):
+            if (a := li.find("a", onclick=True)) is not None and (
+                entry := _step_fertig_entry(a["onclick"])
+            ) is not None:
+                extracted_data.append(entry)
+        return extracted_data
+    for li in html.find_all("li"):
+        name = li.contents[2].replace("\n", "").replace(" ", "")
+        input_id = li.input.attrs["id"][15:]
+        extracted_data.append({"name": name, "data": input_id})
+
+    # Abfallarten
+    if html.find("ion-list"):
+        for item in html.find_all("ion-item"):
+            name = item.find("ion-text").contents[0]
+            onclick = item.contents[1].attrs["onclick"]
+            input_id = onclick[4:].split("'")[0][15:]
+            extracted_data.append({"name": name, "data": input_id})
+    return extracted_data
+
+
+class PickupSchedule:
+    """Sorted pickup dates per category id, stored as date ordinals.
+
+    Instances are immutable, so a schedule can be shared by several entries.
+    """
+
+    __slots__ = ("_dates",)
+
+    def __init__(self, dates: Mapping[str, array] | None = None) -> None:
+        """Initialize from sorted arrays of date ordinals per category id."""
+
+        self._dates: dict[str, array] = dict(dates or {})
+
+    @classmethod
+    def from_dates(
+        cls, dates: Mapping[str, Iterable[datetime.date]]
+    ) -> "PickupSchedule":
+        """Build a schedule from dates per category id in any order."""
+
+        return cls(
+            {
+                category: array("I", sorted(d.toordinal() for d in values))
+                for category, values in dates.items()
+            }
+        )
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if both schedules hold the same dates."""
+
+        if not isinstance(other, PickupSchedule):
+            return NotImplemented
+        return self._dates == other._dates
+
+    def __len__(self) -> int:
+        """Return the number of categories."""
+
+        return len(self._dates)
+
+    def categories(self) -> list[str]:
+        """Return the category ids of the schedule."""
+
+        return list(self._dates)
+
+    def dates(self, category: str) -> list[datetime.date]:
+        """Return all pickup dates of a category."""
+
+        return [datetime.date.fromordinal(o) for o in self._dates.get(category, ())]
+
+    def next_k(
+        self, category: str, k: int, today: datetime.date
+    ) -> list[datetime.date]:
+        """Return the next k pickup dates from today on."""
+
+        ordinals = self._dates.get(category, ())
+        start = bisect_left(ordinals, today.toordinal())
+        return [datetime.date.fromordinal(o) for o in ordinals[start : start + k]]
+
+    def next(self, category: str, today: datetime.date) -> datetime.date | None:
+        """Return the next pickup date from today on."""
+
+        dates = self.next_k(category, 1, today)
+        return dates[0] if dates else None
+
+    def range(
+        self, category: str, start: datetime.date, end: datetime.date
+    ) -> list[datetime.date]:
+        """Return the pickup dates from start up to, but excluding, end."""
+
+        ordinals = self._dates.get(category, ())
+        first = bisect_left(ordinals, start.toordinal())
+        last = bisect_left(ordinals, end.toordinal(), first)
+        return [datetime.date.fromordinal(o) for o in ordinals[first:last]]
+
+    def days_until(self, category: str, today: datetime.date) -> int | None:
+        """Return the days until the next pickup, None if there is none."""
+
+        ordinals = self._dates.get(category, ())
+        index = bisect_left(ordinals, today.toordinal())
+        if index == len(ordinals):
+            return None
+        return ordinals[index] - today.toordinal()
+
+    def diff(
+        self, previous: "PickupSchedule", category: str
+    ) -> tuple[
+        list[datetime.date],
+        list[datetime.date],
+        list[tuple[datetime.date, datetime.date]],
+    ]:
+        """Return the dates of a category added, removed and moved since previous.
+
+        A removed date is considered moved if a date was added within
+        MOVE_WINDOW days of it, as with pickups shifted by a holiday.
+        """
+
+        current = self._dates.get(category, array("I"))
+        before = previous._dates.get(category, array("I"))
+        if current == before:
+            return [], [], []
+        current_set = set(current)
+        before_set = set(before)
+        added_ordinals = [o for o in current if o not in before_set]
+        removed_ordinals = [o for o in before if o not in current_set]
+
+        added, removed, moved = [], [], []
+        i = j = 0
+        while i < len(removed_ordinals) and j < len(added_ordinals):
+            old, new = removed_ordinals[i], added_ordinals[j]
+            if abs(new - old) <= MOVE_WINDOW:
+                moved.append((old, new))
+                i += 1
+                j += 1
+            elif old < new:
+                removed.append(old)
+                i += 1
+            else:
+                added.append(new)
+                j += 1
+        removed.extend(removed_ordinals[i:])
+        added.extend(added_ordinals[j:])
+
+        to_date = datetime.date.fromordinal
+        return (
+            [to_date(o) for o in added],
+            [to_date(o) for o in removed],
+            [(to_date(old), to_date(new)) for old, new in moved],
+        )
+
+
+class AppRegistry:
+    """All known Abfallplus apps, indexed by name."""
+
+    __slots__ = ("apps", "by_name")
+
+    def __init__(self, apps: list[dict]) -> None:
+        """Index the given apps."""
+
+        self.apps = apps
+        self.by_name = {app["name"]: app for app in apps}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "AppRegistry":
+        """Load the registry from its compact JSON file."""
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        fields = data["fields"]
+        return cls([dict(zip(fields, row, strict=True)) for row in data["apps"]])
+
+
+@functools.cache
+def load_app_registry() -> AppRegistry:
+    """Return the app registry, loading it on first use.
+
+    The first call reads a file and should not run in the event loop.
+    """
+
+    return AppRegistry.from_file(APPS_FILE)
+
+
+class RefreshStats:
+    """Per-phase timings, transfer and cache counters of the API client."""
+
+    LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+    def __init__(self, window: int = 100) -> None:
+        """Initialize the counters, keeping the latencies of window refreshes."""
+
+        self.refreshes = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_received = 0
+        self.last_bytes_received = 0
+        self.last_phases: dict[str, float] = {}
+        self.last_duration: float | None = None
+        self.latencies: deque[float] = deque(maxlen=window)
+        self._phases: dict[str, float] = {}
+        self._bytes = 0
+        self._started: float | None = None
+
+    def start(self) -> None:
+        """Start measuring a refresh."""
+
+        self._phases = {}
+        self._bytes = 0
+        self._started = time.perf_counter()
+
+    def finish(self, success: bool) -> None:
+        """Finish measuring a refresh."""
+
+        if self._started is None:
+            return
+        self.last_duration = time.perf_counter() - self._started
+        self._started = None
+        self.refreshes += 1
+        if not success:
+            self.failures += 1
+        self.latencies.append(self.last_duration)
+        self.last_phases = self._phases
+        self.last_bytes_received = self._bytes
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to a phase of the refresh."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, duration: float) -> None:
+        """Add a duration to a phase of the refresh."""
+
+        self._phases[name] = self._phases.get(name, 0.0) + duration
+
+    def add_bytes(self, count: int) -> None:
+        """Count received bytes."""
+
+        self._bytes += count
+        self.bytes_received += count
+
+    def histogram(self) -> dict[str, int]:
+        """Return the number of recent refreshes per latency bucket."""
+
+        counts = [0] * len(self.LATENCY_BUCKETS)
+        for latency in self.latencies:
+            counts[bisect_left(self.LATENCY_BUCKETS, latency)] += 1
+        labels = [f"<={bucket}s" for bucket in self.LATENCY_BUCKETS[:-1]]
+        labels.append(f">{self.LATENCY_BUCKETS[-2]}s")
+        return dict(zip(labels, counts, strict=True))
+
+    def as_dict(self) -> dict:
+        """Return all counters."""
+
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "bytes_received": self.bytes_received,
+            "last_bytes_received": self.last_bytes_received,
+            "last_duration": self.last_duration,
+            "last_phases": self.last_phases,
+            "latency_histogram": self.histogram(),
+        }
+
+
+class _StreamingUnzip:
+    """Decompress the first member of a zip archive chunk by chunk.
+
+    Data that does not start with a zip local file header is passed through
+    unchanged.
+    """
+
+    _HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._zipped: bool | None = None
+        self._decompressor = None
+        self._remaining: int | None = None
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """Yield the decompressed data available after this chunk.
+
+        Decompressed data is yielded in pieces of at most CHUNK_SIZE bytes,
+        so a highly compressed chunk does not expand in memory at once.
+        """
+
+        if self._zipped is None:
+            self._buffer += chunk
+            if len(self._buffer) < 4:
+                return
+            if not self._buffer.startswith(b"PK\x03\x04"):
+                self._zipped = False
+                chunk, self._buffer = self._buffer, b""
+                yield chunk
+                return
+            if len(self._buffer) < self._HEADER.size:
+                return
+            header = self._HEADER.unpack_from(self._buffer)
+            flags, method, compressed_size = header[2], header[3], header[7]
+            start = self._HEADER.size + header[9] + header[10]
+            if len(self._buffer) < start:
+                return
+            if method == 8:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            elif method != 0:
+                raise ValueError(f"Unsupported zip compression method {method}")
+            elif flags & 0x08:
+                # The size of a stored member follows its data then
+                raise ValueError("Unsupported stored zip member with data descriptor")
+            else:
+                self._remaining = compressed_size
+            self._zipped = True
+            chunk, self._buffer = self._buffer[start:], b""
+
+        if not self._zipped:
+            yield chunk
+            return
+        if self._decompressor is not None:
+            while chunk and not self._decompressor.eof:
+                yield self._decompressor.decompress(chunk, CHUNK_SIZE)
+                chunk = self._decompressor.unconsumed_tail
+            return
+        chunk = chunk[: self._remaining]
+        self._remaining -= len(chunk)
+        yield chunk
+
+
+class _PickupDatesParser:
+    """Incrementally extract the dates array of a struktur.xml plist.
+
+    Only the category and pickup date of each entry are kept, and only for
+    the given categories, so memory does not grow with the district size.
+    """
+
+    _VALUES = ("string", "date", "integer")
+
+    def __init__(self, categories: set[str] | None = None) -> None:
+        self._categories = categories
+        self._unzip = _StreamingUnzip()
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+        self._stack: list[str] = []
+        self._text: list[str] = []
+        self._key: str | None = None
+        self._dates_depth: int | None = None
+        self._entry: dict[str, str] | None = None
+        self.found_dates = False
+        self._ordinals: dict[str, array] = {}
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next chunk of the response body."""
+
+        for data in self._unzip.feed(chunk):
+            if data:
+                self._parser.Parse(data, False)
+
+    def close(self) -> PickupSchedule:
+        """Finish parsing and return the schedule."""
+
+        self._parser.Parse(b"", True)
+        if not self.found_dates:
+            raise ValueError("No dates found in pickup data")
+        return PickupSchedule(
+            {
+                category: array("I", sorted(ordinals))
+                for category, ordinals in self._ordinals.items()
+            }
+        )
+
+    def _start(self, name: str, attrs: dict) -> None:
+        self._text = []
+        depth = len(self._stack)
+        if self._dates_depth is None:
+            if name == "array" and depth == 2 and self._key == "dates":
+                self._dates_depth = depth
+                self.found_dates = True
+        elif name == "dict" and depth == self._dates_depth + 1:
+            self._entry = {}
+        self._stack.append(name)
+
+    def _end(self, name: str) -> None:
+        self._stack.pop()
+        depth = len(self._stack)
+        if name == "key":
+            self._key = "".join(self._text)
+        elif self._dates_depth is None:
+            return
+        elif self._entry is not None and depth == self._dates_depth + 2:
+            if name in self._VALUES and self._key in ("category_id", "pickup_date"):
+                self._entry[self._key] = "".join(self._text)
+        elif self._entry is not None and depth == self._dates_depth + 1:
+            self._add(self._entry)
+            self._entry = None
+        elif depth == self._dates_depth:
+            self._dates_depth = None
+
+    def _data(self, data: str) -> None:
+        if self._stack and self._stack[-1] in ("key", *self._VALUES):
+            self._text.append(data)
+
+    def _add(self, entry: dict[str, str]) -> None:
+        if "category_id" not in entry or "pickup_date" not in entry:
+            return
+        category = entry["category_id"].split("-")[1]
+        if self._categories is not None and category not in self._categories:
+            return
+        if (ordinals := self._ordinals.get(category)) is None:
+            ordinals = self._ordinals[category] = array("I")
+        ordinals.append(_parse_date(entry["pickup_date"]).toordinal())
+
 
 class AbfallplusApp:
     """Abfallplus API class."""
 
     config = {}
 
-    def __init__(self, config=None) -> None:
-        """Instantiate a new abfallplus.Api object."""
+    def __init__(
+        self,
+        config=None,
+        session: aiohttp.ClientSession | None = None,
+        base_url: str = BASE_URL,
+    ) -> None:
+        """Instantiate a new abfallplus.Api object.
+
+        A pooled session (e.g. from Home Assistant) can be injected, otherwise
+        a keep-alive session with its own cookie jar is created on first use.
+        The base URL can point to a local stand-in of the API.
+        """
+
+        self.base_url = base_url
+        self._login_expires: float | None = None
+        self.stats = RefreshStats()
+        self._session = session
+        self._session_owner = session is None
+
+        # Change detection state of the last struktur.xml.zip download
+        self.version_state: dict | None = None
+        # Sorted pickup dates per category id of the last download
+        self.schedule: PickupSchedule | None = None
 
         if config is not None:
             self.config = config
         else:
+            self.config = {}
             self.config["client_id"] = str(uuid.uuid1())
             self.config["cookie"] = None
             self.config["app"] = None
@@ -38,6 +611,30 @@ class AbfallplusApp:
             self.config["hnr"] = None
             self.config["abfallarten"] = []
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the long-lived session, creating it on first use."""
+
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=LIMIT_PER_HOST, ttl_dns_cache=DNS_CACHE_TTL
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.CookieJar()
+            )
+            self._session_owner = True
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session if it was created by this instance."""
+
+        if (
+            self._session_owner
+            and self._session is not None
+            and not self._session.closed
+        ):
+            await self._session.close()
+        self._session = None
+
     def _createPostData(self, additional_post_data=None):
         c = self.config
         post_data = [
@@ -70,23 +667,14 @@ class AbfallplusApp:
             list: A sequence of app ID instances.
 
         """
-        apps_mapping = []
-        apps_mapping.append(
-            {
-                "name": "ZAW-DW",
-                "app_id": "de.k4systems.zawdw",
-                "landkreis_id": "633|0|AWG Donau-Wald",
-                "bundesland_id": "247",
-            }
-        )
-        # TODO: Add all the other apps
-
-        return apps_mapping
+        return load_app_registry().apps
 
     def set_app(self, app) -> None:
         """Set the app to be used for the API."""
 
-        self.config["app"] = app
+        self.config["app"] = {
+            key: app[key] for key in ("name", "app_id", "landkreis_id", "bundesland_id")
+        }
         _LOGGER.debug("Set app to be %s", app)
 
     async def get_communities(self):
@@ -148,62 +736,173 @@ class AbfallplusApp:
         await self._request(url="assistent/finish/", additional_post_data=post)
         return self.config
 
-    async def get_pickup_times(self) -> dict | None:
-        """Return the pickup times for the configured waste types."""
+    async def get_pickup_times(self, count: int = 2) -> dict | None:
+        """Return the next pickup times for the configured waste types."""
+
+        self.stats.start()
+        result = None
+        try:
+            result = await self._fetch_pickup_times(count)
+        finally:
+            self.stats.finish(result is not None)
+        return result
+
+    async def _fetch_pickup_times(self, count: int) -> dict | None:
+        """Fetch the schedule if it changed and return the next pickup times."""
 
         post_data = {
             "client": self.config["client_id"],
             "app_id": self.config["app"]["app_id"],
         }
 
-        async with aiohttp.ClientSession() as session:
-            await session.post(
-                url=BASE_URL + "login",
-                data=post_data,
-                cookies=self.config["cookie"],
-                headers=HEADERS,
-            )
-            await session.post(
-                url=BASE_URL + "version.xml?renew=1",
-                data=post_data,
-                cookies=self.config["cookie"],
-                headers=HEADERS,
+        # Log in outside of the version phase, which would count the login
+        # time twice otherwise. A failed login is not retried by _post.
+        if not await self._login():
+            return None
+        with self.stats.phase("version"):
+            async with await self._post("version.xml?renew=1", post_data) as resp:
+                version_body = await resp.read()
+                version_state = self._version_state(resp, version_body)
+        self.stats.add_bytes(len(version_body))
+
+        if (
+            self.schedule is not None
+            and version_state is not None
+            and self.version_state is not None
+            and version_state["version"] == self.version_state["version"]
+        ):
+            _LOGGER.debug("Pickup times unchanged, skipping structure download")
+            self.stats.cache_hits += 1
+            return self.next_pickups(count)
+
+        headers = dict(HEADERS)
+        if self.schedule is not None and self.version_state is not None:
+            if self.version_state.get("etag"):
+                headers["If-None-Match"] = self.version_state["etag"]
+            if self.version_state.get("last_modified"):
+                headers["If-Modified-Since"] = self.version_state["last_modified"]
+
+        download_started = time.perf_counter()
+        parse_time = 0.0
+        async with await self._post("struktur.xml.zip", post_data, headers) as resp:
+            if resp.status == 304 and self.schedule is not None:
+                _LOGGER.debug("Pickup times not modified")
+                self.stats.cache_hits += 1
+                if version_state is not None:
+                    self.version_state = {
+                        **self.version_state,
+                        "version": version_state["version"],
+                    }
+                return self.next_pickups(count)
+            if resp.status != 200:
+                _LOGGER.warning("Error in fetching pickup times")
+                return None
+
+            # Parse pickup data while it is downloaded
+            self.stats.cache_misses += 1
+            categories = {a["data"] for a in self.config["abfallarten"]}
+            parser = _PickupDatesParser(categories or None)
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                self.stats.add_bytes(len(chunk))
+                parse_started = time.perf_counter()
+                parser.feed(chunk)
+                parse_time += time.perf_counter() - parse_started
+            if version_state is not None:
+                version_state["etag"] = resp.headers.get("ETag")
+                version_state["last_modified"] = resp.headers.get("Last-Modified")
+
+        parse_started = time.perf_counter()
+        self.schedule = parser.close()
+        parse_time += time.perf_counter() - parse_started
+        self.stats.add_time("parse", parse_time)
+        self.stats.add_time(
+            "download", time.perf_counter() - download_started - parse_time
+        )
+        self.version_state = version_state
+        return self.next_pickups(count)
+
+    @staticmethod
+    def _version_state(resp: aiohttp.ClientResponse, body: bytes) -> dict | None:
+        """Return the change marker of a version.xml response."""
+
+        if resp.status != 200 or not body:
+            return None
+        return {
+            "version": hashlib.sha1(body).hexdigest(),
+            "etag": None,
+            "last_modified": None,
+        }
+
+    def dump_schedule(self) -> dict:
+        """Return the parsed schedule and its version marker for persistence."""
+
+        return {
+            "version_state": self.version_state,
+            "schedule": {
+                category: [d.isoformat() for d in self.schedule.dates(category)]
+                for category in self.schedule.categories()
+            }
+            if self.schedule is not None
+            else None,
+        }
+
+    def restore_schedule(self, data: dict) -> None:
+        """Restore a schedule previously returned by dump_schedule.
+
+        Addresses never fetched were stored with an empty schedule, which
+        is restored as no schedule.
+        """
+
+        self.version_state = data.get("version_state")
+        if not data.get("schedule"):
+            self.schedule = None
+            return
+        self.schedule = PickupSchedule.from_dates(
+            {
+                category: [datetime.date.fromisoformat(d) for d in dates]
+                for category, dates in data["schedule"].items()
+            }
+        )
+
+    def next_pickups(
+        self,
+        count: int = 2,
+        today: datetime.date | None = None,
+        abfallarten: list | None = None,
+    ) -> dict[str, list[datetime.date]]:
+        """Return the next pickup dates from today on per waste type.
+
+        Defaults to the configured waste types if none are given.
+        """
+
+        if today is None:
+            today = datetime.date.today()
+        if abfallarten is None:
+            abfallarten = self.config["abfallarten"]
+        extracted_data = {}
+        for a in abfallarten:
+            extracted_data[a["name"]] = (
+                self.schedule.next_k(a["data"], count, today) if self.schedule else []
             )
-            async with session.post(
-                url=BASE_URL + "struktur.xml.zip",
-                data=post_data,
-                headers=HEADERS,
-            ) as resp:
-                if resp.status != 200:
-                    _LOGGER.warning("Error in fetching pickup times")
-                    return None
-
-                # Parse pickup data
-                received_data = await resp.content.read()
-                content = plist.loads(received_data, fmt=plist.FMT_XML)
-                extracted_data = {}
-                for a in self.config["abfallarten"]:
-                    dates = []
-                    i = 0
-                    for d in content["dates"]:
-                        if d["category_id"].split("-")[1] == a["data"]:
-                            date_only = parse(d["pickup_date"]).date()
-                            dates.append(date_only)
-                            i = i + 1
-                        if i > 1:
-                            break
-                    extracted_data[a["name"]] = dates
-                return extracted_data
-
-    async def _login(self) -> None:
-        """Login to the API."""
+        return extracted_data
+
+    async def _login(self, force: bool = False) -> bool:
+        """Login to the API unless the current session is still valid.
+
+        Returns False if the login failed.
+        """
 
         if self.config["app"]["app_id"] is None:
             raise ValueError("Set app first")
 
-        # Return if cookie already set
-        if self.config["cookie"] is not None:
-            return
+        # Return if the session cookie is still valid
+        if (
+            not force
+            and self.config["cookie"] is not None
+            and self._login_expires is not None
+            and time.monotonic() < self._login_expires
+        ):
+            return True
 
         post_data = {
             "client": self.config["client_id"],
@@ -212,44 +911,110 @@ class AbfallplusApp:
 
         _LOGGER.debug("Starting login")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url=BASE_URL + "config.xml",
-                data=post_data,
-                headers=HEADERS,
-            ) as resp:
-                self.config["cookie"] = session.cookie_jar.filter_cookies(BASE_URL)
-                status = resp.status
-
-            if status != 200:
-                _LOGGER.warning("Cookie fetching failed")
-            else:
-                async with session.post(
-                    url=BASE_URL + "login/",
-                    data=post_data,
-                    headers=HEADERS,
-                ) as resp:
-                    if resp.status != 200:
-                        _LOGGER.warning("Login failed")
-                    _LOGGER.debug("Login sucessfull")
+        with self.stats.phase("login"):
+            return await self._async_login(post_data)
+
+    async def _async_login(self, post_data: dict) -> bool:
+        """Fetch a session cookie and login with it, returning the success."""
+
+        session = self._get_session()
+        async with session.post(
+            url=self.base_url + "config.xml",
+            data=post_data,
+            headers=HEADERS,
+        ) as resp:
+            self.stats.add_bytes(len(await resp.read()))
+            # Keep the cookies with the config, so that a session shared by
+            # several clients (without a cookie jar) can be used as well.
+            cookies = session.cookie_jar.filter_cookies(self.base_url)
+            cookies.update(resp.cookies)
+            self.config["cookie"] = cookies
+            lifetime = self._session_lifetime(resp)
+            status = resp.status
 
-    async def _request(self, url, additional_post_data=None) -> list:
-        """Request data from the API."""
+        if status != 200:
+            _LOGGER.warning("Cookie fetching failed")
+            return False
+        async with session.post(
+            url=self.base_url + "login/",
+            data=post_data,
+            cookies=self.config["cookie"],
+            headers=HEADERS,
+        ) as resp:
+            self.stats.add_bytes(len(await resp.read()))
+            if resp.status != 200:
+                _LOGGER.warning("Login failed")
+                return False
+        self._login_expires = time.monotonic() + lifetime
+        _LOGGER.debug("Login sucessfull")
+        return True
+
+    @staticmethod
+    def _session_lifetime(resp: aiohttp.ClientResponse) -> float:
+        """Return the lifetime of the session cookies set by a response.
+
+        Infinite without Max-Age or Expires; _post logs in again once the
+        API rejects the session.
+        """
+
+        lifetimes = []
+        for morsel in resp.cookies.values():
+            if morsel["max-age"]:
+                lifetimes.append(float(morsel["max-age"]))
+            elif morsel["expires"]:
+                try:
+                    expires = datetime.datetime.strptime(
+                        morsel["expires"], "%a, %d %b %Y %H:%M:%S GMT"
+                    ).replace(tzinfo=datetime.UTC)
+                except ValueError:
+                    continue
+                lifetimes.append(
+                    (expires - datetime.datetime.now(datetime.UTC)).total_seconds()
+                )
+        return min(lifetimes, default=math.inf)
+
+    async def _post(
+        self, url: str, data, headers: dict = HEADERS
+    ) -> aiohttp.ClientResponse:
+        """POST to the API, logging in again once if the session expired.
+
+        Raises RateLimitedError if the API asks to retry later.
+        """
 
         await self._login()
+        session = self._get_session()
+        resp = await session.post(
+            url=self.base_url + url,
+            data=data,
+            cookies=self.config["cookie"],
+            headers=headers,
+        )
+        if resp.status in AUTH_FAILED_STATUS:
+            resp.release()
+            _LOGGER.debug("Session of %s expired, logging in again", url)
+            await self._login(force=True)
+            resp = await session.post(
+                url=self.base_url + url,
+                data=data,
+                cookies=self.config["cookie"],
+                headers=headers,
+            )
+        if resp.status in RATE_LIMITED_STATUS:
+            resp.release()
+            retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+            _LOGGER.debug("Rate limited on %s, retry after %s s", url, retry_after)
+            raise RateLimitedError(resp.status, retry_after)
+        return resp
 
-        _LOGGER.debug("Starting request to %s", BASE_URL + url)
+    async def _request(self, url, additional_post_data=None) -> list:
+        """Request data from the API."""
+
+        _LOGGER.debug("Starting request to %s", self.base_url + url)
 
         # Request data
-        async with (
-            aiohttp.ClientSession() as session,
-            session.post(
-                url=BASE_URL + url,
-                data=self._createPostData(additional_post_data),
-                cookies=self.config["cookie"],
-                headers=HEADERS,
-            ) as resp,
-        ):
+        async with await self._post(
+            url, self._createPostData(additional_post_data)
+        ) as resp:
             received_data = await resp.text(encoding="utf-8")
             status = resp.status
 
@@ -264,64 +1029,7 @@ class AbfallplusApp:
         if "OK|Yeah" in received_data:
             _LOGGER.info("Sucessfully registered")
 
-        extracted_data = []
-        html = BeautifulSoup(received_data, "html.parser")
-
-        if not html.find("input"):
-            for li in html.find_all("li"):
-                onclick = li.a.attrs["onclick"]
-                onclick = onclick[onclick.find("step_fertig('") + 12 : -1]
-                onclick_split = onclick.replace("'", "").split(",")
-                extracted_data.append(
-                    {"name": onclick_split[1], "data": onclick_split[0]}
-                )
+        # Fast path for the large street and community lists
+        if (extracted_data := _extract_step_fertig(received_data)) is not None:
             return extracted_data
-        for li in html.find_all("li"):
-            name = li.contents[2].replace("\n", "").replace(" ", "")
-            input_id = li.input.attrs["id"][15:]
-            extracted_data.append({"name": name, "data": input_id})
-
-        # Abfallarten
-        if html.find("ion-list"):
-            for item in html.find_all("ion-item"):
-                name = item.find("ion-text").contents[0]
-                onclick = item.contents[1].attrs["onclick"]
-                input_id = onclick[4:].split("'")[0][15:]
-                extracted_data.append({"name": name, "data": input_id})
-        return extracted_data
-
-
-# async def main():
-#     api = AbfallplusApp()
-
-#     apps = api.get_apps()
-#     api.set_app(apps[0])
-
-#     communities = await api.get_communities()
-#     api.set_community(communities[85])
-
-#     streets = await api.get_streets()
-#     api.set_street(streets[117])
-
-#     hnr = await api.get_hnr()
-#     api.set_hnr(hnr[11])
-
-#     abfallart = await api.get_abfallarten()
-#     api.add_abfallart(abfallart[0])
-#     api.add_abfallart(abfallart[1])
-
-#     config = await api.finalize_assistant()
-
-#     # Reset API and use config
-#     api = AbfallplusApp(config)
-#     pickup_times = await api.get_pickup_times()
-#     print(pickup_times)
-
-
-# if __name__ == "__main__":
-#     logging.basicConfig()
-#     _LOGGER.setLevel(logging.INFO)
-
-#     loop = asyncio.new_event_loop()
-#     loop.create_task(main())
-#     loop.run_forever()
+        return _parse_config_entries_soup(received_data)
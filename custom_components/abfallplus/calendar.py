@@ -0,0 +1,127 @@
+"""Abfallplus calendar platform."""
+
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta
+import heapq
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+)
+from homeassistant.util import dt as dt_util
+
+from . import address_label
+from .abfallplus_app_lib import PickupSchedule
+from .const import CONF_ADDRESSES, DOMAIN, ENTRY_COORDINATOR
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the calendar from a config entry created in the integrations UI."""
+    entry = hass.data[DOMAIN][config_entry.entry_id]
+    coordinator = entry[ENTRY_COORDINATOR]
+
+    device_info = DeviceInfo(
+        entry_type=DeviceEntryType.SERVICE,
+        identifiers={(DOMAIN, "abfallplus")},
+        manufacturer="Abfallplus",
+        name="Abfallplus",
+    )
+    addresses = config_entry.data[CONF_ADDRESSES]
+    async_add_entities(
+        WasteCalendar(
+            coordinator,
+            device_info,
+            # The first address keeps the id and name of single address entries
+            f"{config_entry.entry_id}_{index}_calendar"
+            if index
+            else f"{config_entry.entry_id}_calendar",
+            address_label(address) if len(addresses) > 1 else None,
+            index,
+            address["abfallarten"],
+        )
+        for index, address in enumerate(addresses)
+    )
+
+
+class WasteCalendar(CoordinatorEntity, CalendarEntity):
+    """All pickup dates of the configured waste types."""
+
+    _attr_has_entity_name = True
+    _attr_name = None
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        device_info: DeviceInfo,
+        unique_id: str,
+        name: str | None,
+        address: int,
+        abfallarten: list[dict],
+    ) -> None:
+        """Initialize the calendar."""
+        super().__init__(coordinator, context=(address, None))
+        self._attr_device_info = device_info
+        self._attr_unique_id = unique_id
+        self._attr_name = name
+        self._address = address
+        self._abfallarten = abfallarten
+
+    @property
+    def _schedule(self) -> PickupSchedule | None:
+        """Return the schedule of the address."""
+        if self.coordinator.data is None:
+            return None
+        return self.coordinator.data[self._address]
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """Return the next upcoming pickup."""
+        if (schedule := self._schedule) is None:
+            return None
+        today = dt_util.now().date()
+        upcoming = [
+            (date, a["name"])
+            for a in self._abfallarten
+            if (date := schedule.next(a["data"], today)) is not None
+        ]
+        if not upcoming:
+            return None
+        date, name = min(upcoming)
+        return CalendarEvent(start=date, end=date + timedelta(days=1), summary=name)
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: datetime, end_date: datetime
+    ) -> list[CalendarEvent]:
+        """Return the pickups between start_date and end_date."""
+        if (schedule := self._schedule) is None:
+            return []
+
+        # All-day events overlap the window if they start before its end
+        start = dt_util.as_local(start_date).date()
+        end_local = dt_util.as_local(end_date)
+        end = end_local.date()
+        if end_local.time() != time.min:
+            end += timedelta(days=1)
+
+        return [
+            CalendarEvent(start=date, end=date + timedelta(days=1), summary=name)
+            for date, name in heapq.merge(
+                *(
+                    [
+                        (date, a["name"])
+                        for date in schedule.range(a["data"], start, end)
+                    ]
+                    for a in self._abfallarten
+                )
+            )
+        ]
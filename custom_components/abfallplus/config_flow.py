@@ -1,43 +1,128 @@
 """Config flow for Abfallplus integration."""
 
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+import secrets
+import time
 from typing import Any
 
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
 
-from .abfallplus_app_lib import AbfallplusApp
-from .const import DOMAIN  # pylint:disable=unused-import
+from .abfallplus_app_lib import AbfallplusApp, load_app_registry
+from .const import (  # pylint:disable=unused-import
+    CONF_ADDRESSES,
+    CONF_DATE_FORMAT,
+    CONF_FEED_TOKEN,
+    CONF_LOCALE,
+    CONF_MAX_CONCURRENT,
+    DEFAULT_DATE_FORMAT,
+    DEFAULT_LOCALE,
+    DEFAULT_MAX_CONCURRENT,
+    DOMAIN,
+)
+from .feed import feed_path
+from .formatting import DateFormatter
+from .search import SearchIndex
+
+LOOKUP_CACHE_TTL = 3600
+LOOKUP_CACHE_SIZE = 64
+
+# Lists longer than this are searched instead of shown as one dropdown
+SEARCH_THRESHOLD = 50
+SEARCH_LIMIT = 20
+
+
+class _LookupCache:
+    """TTL/LRU cache of assistant lists shared by all config flows."""
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._data: OrderedDict[tuple, tuple[float, list]] = OrderedDict()
+
+    async def async_get(
+        self, key: tuple, fetch: Callable[[], Awaitable[list | None]]
+    ) -> list | None:
+        """Return the cached list for key, fetching it if missing or expired."""
+        if (cached := self._data.get(key)) is not None:
+            if time.monotonic() - cached[0] < self._ttl:
+                self._data.move_to_end(key)
+                return cached[1]
+            del self._data[key]
+
+        result = await fetch()
+        if result is not None:
+            self._data[key] = (time.monotonic(), result)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+        return result
+
+
+_LOOKUP_CACHE = _LookupCache(LOOKUP_CACHE_TTL, LOOKUP_CACHE_SIZE)
 
 
 class AbfallPlusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Abfallplus."""
 
-    VERSION = 1
+    VERSION = 4
     CONNECTION_CLASS = config_entries.CONN_CLASS_CLOUD_POLL
 
-    api = AbfallplusApp()
+    def __init__(self) -> None:
+        """Initialize the config flow."""
+        self.api = AbfallplusApp()
+        self._indexes: dict[str, SearchIndex] = {}
+        self._matches: dict[str, list[str]] = {}
+        self._addresses: list[dict] = []
+
+    @callback
+    def async_remove(self) -> None:
+        """Close the session of the flow."""
+        self.hass.async_create_task(self.api.close())
+
+    async def _async_lookup(
+        self, kind: str, fetch: Callable[[], Awaitable[list | None]]
+    ) -> list:
+        """Return an assistant list, cached by app and parent selection."""
+        config = self.api.config
+        key = (
+            kind,
+            config["app"]["app_id"],
+            config["app"]["landkreis_id"],
+            config["community"]["data"] if config["community"] else None,
+            config["street"]["data"] if config["street"] else None,
+            config["hnr"]["data"] if config["hnr"] else None,
+        )
+        return await _LOOKUP_CACHE.async_get(key, fetch) or []
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return AbfallPlusOptionsFlow()
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None):
         """Invoke when a user initiates a flow via the user interface."""
 
+        registry = await self.hass.async_add_executor_job(load_app_registry)
         if user_input is not None:
-            for app in self.api.get_apps():
-                if user_input["app_id"] == app["name"]:
-                    self.api.set_app(app)
-                    break
+            self.api.set_app(registry.by_name[user_input["app_id"]])
             return await self.async_step_community()
 
         # create form
         data_schema = vol.Schema(
-            {vol.Required("app_id"): vol.In([a["name"] for a in self.api.get_apps()])}
+            {vol.Required("app_id"): vol.In(sorted(registry.by_name))}
         )
         return self.async_show_form(step_id="user", data_schema=data_schema)
 
     async def async_step_community(self, user_input: dict[str, Any] | None = None):
         """Second step in config flow to add a repo to watch."""
-        communities = await self.api.get_communities()
+        communities = await self._async_lookup("community", self.api.get_communities)
         if user_input is not None:
             for com in communities:
                 if user_input["community_id"] == com["name"]:
@@ -53,48 +138,98 @@ class AbfallPlusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_street(self, user_input: dict[str, Any] | None = None):
         """Second step in config flow to add a repo to watch."""
-        streets = await self.api.get_streets()
+        index = await self._async_search_index("street", self.api.get_streets)
         if user_input is not None:
-            for st in streets:
-                if user_input["street_id"] == st["name"]:
-                    self.api.set_street(st)
-                    break
+            self.api.set_street(index.by_name[user_input["street_id"]])
             return await self.async_step_hnr()
+        if len(index.by_name) > SEARCH_THRESHOLD and "street" not in self._matches:
+            return await self.async_step_street_search()
 
         # create form
         data_schema = vol.Schema(
-            {vol.Required("street_id"): vol.In([a["name"] for a in streets])}
+            {vol.Required("street_id"): vol.In(self._choices("street", index))}
         )
         return self.async_show_form(
             step_id="street", data_schema=data_schema, errors={}
         )
 
+    async def async_step_street_search(self, user_input: dict[str, Any] | None = None):
+        """Search the street in large districts."""
+        index = await self._async_search_index("street", self.api.get_streets)
+        errors = {}
+        if user_input is not None:
+            matches = index.search(user_input["query"], SEARCH_LIMIT)
+            if len(matches) == 1:
+                return await self.async_step_street({"street_id": matches[0]["name"]})
+            if matches:
+                self._matches["street"] = [m["name"] for m in matches]
+                return await self.async_step_street()
+            errors["query"] = "no_match"
+
+        # create form
+        data_schema = vol.Schema({vol.Required("query"): str})
+        return self.async_show_form(
+            step_id="street_search", data_schema=data_schema, errors=errors
+        )
+
     async def async_step_hnr(self, user_input: dict[str, Any] | None = None):
         """Second step in config flow to add a repo to watch."""
-        hnr = await self.api.get_hnr()
+        index = await self._async_search_index("hnr", self.api.get_hnr)
         if user_input is not None:
-            for h in hnr:
-                if user_input["hnr_id"] == h["name"]:
-                    self.api.set_hnr(h)
-                    break
+            self.api.set_hnr(index.by_name[user_input["hnr_id"]])
             return await self.async_step_abfallarten()
+        if len(index.by_name) > SEARCH_THRESHOLD and "hnr" not in self._matches:
+            return await self.async_step_hnr_search()
 
         # create form
         data_schema = vol.Schema(
-            {vol.Required("hnr_id"): vol.In([a["name"] for a in hnr])}
+            {vol.Required("hnr_id"): vol.In(self._choices("hnr", index))}
         )
         return self.async_show_form(step_id="hnr", data_schema=data_schema)
 
+    async def async_step_hnr_search(self, user_input: dict[str, Any] | None = None):
+        """Search the house number of streets with many of them."""
+        index = await self._async_search_index("hnr", self.api.get_hnr)
+        errors = {}
+        if user_input is not None:
+            matches = index.search(user_input["query"], SEARCH_LIMIT)
+            if len(matches) == 1:
+                return await self.async_step_hnr({"hnr_id": matches[0]["name"]})
+            if matches:
+                self._matches["hnr"] = [m["name"] for m in matches]
+                return await self.async_step_hnr()
+            errors["query"] = "no_match"
+
+        # create form
+        data_schema = vol.Schema({vol.Required("query"): str})
+        return self.async_show_form(
+            step_id="hnr_search", data_schema=data_schema, errors=errors
+        )
+
+    async def _async_search_index(
+        self, kind: str, fetch: Callable[[], Awaitable[list | None]]
+    ) -> SearchIndex:
+        """Return the search index of an assistant list, built once per flow."""
+        if kind not in self._indexes:
+            self._indexes[kind] = SearchIndex(await self._async_lookup(kind, fetch))
+        return self._indexes[kind]
+
+    def _choices(self, kind: str, index: SearchIndex) -> list[str]:
+        """Return the names to choose from, narrowed down by a search."""
+        if kind in self._matches:
+            return self._matches[kind]
+        return list(index.by_name)
+
     async def async_step_abfallarten(self, user_input: dict[str, Any] | None = None):
         """Second step in config flow to add a repo to watch."""
-        abfallarten = await self.api.get_abfallarten()
+        abfallarten = await self._async_lookup("abfallarten", self.api.get_abfallarten)
         if user_input is not None:
             for ab in user_input["abfallarten_id"]:
                 for a in abfallarten:
                     if ab == a["name"]:
                         self.api.add_abfallart(a)
-            config_json = await self.api.finalize_assistant()
-            return self.async_create_entry(title="Abfallplus", data=config_json)
+            self._addresses.append(await self.api.finalize_assistant())
+            return await self.async_step_addresses()
 
         # create form
         all_abfallarten = {a["name"]: a["name"] for a in abfallarten}
@@ -109,3 +244,76 @@ class AbfallPlusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="abfallarten", data_schema=data_schema, errors={}
         )
+
+    async def async_step_addresses(self, user_input: dict[str, Any] | None = None):
+        """Offer to add another address to the entry."""
+        return self.async_show_menu(
+            step_id="addresses", menu_options=["add_address", "finish"]
+        )
+
+    async def async_step_add_address(self, user_input: dict[str, Any] | None = None):
+        """Start the assistant again for another address of the same app.
+
+        The assistant selection is kept per client, so every address gets a
+        client of its own.
+        """
+        app = self.api.config["app"]
+        await self.api.close()
+        self.api = AbfallplusApp()
+        self.api.set_app(app)
+        self._indexes = {}
+        self._matches = {}
+        return await self.async_step_community()
+
+    async def async_step_finish(self, user_input: dict[str, Any] | None = None):
+        """Create the entry with all addresses."""
+        return self.async_create_entry(
+            title="Abfallplus",
+            data={
+                CONF_ADDRESSES: self._addresses,
+                CONF_FEED_TOKEN: secrets.token_urlsafe(24),
+            },
+        )
+
+
+class AbfallPlusOptionsFlow(config_entries.OptionsFlow):
+    """Handle the display options of an Abfallplus entry."""
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None):
+        """Manage the date format and locale."""
+        errors = {}
+        if user_input is not None:
+            formatter = DateFormatter(
+                user_input[CONF_LOCALE], user_input[CONF_DATE_FORMAT]
+            )
+            try:
+                await self.hass.async_add_executor_job(formatter.load_locale)
+            except ValueError:
+                errors[CONF_LOCALE] = "invalid_locale"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_LOCALE, default=options.get(CONF_LOCALE, DEFAULT_LOCALE)
+                ): str,
+                vol.Required(
+                    CONF_DATE_FORMAT,
+                    default=options.get(CONF_DATE_FORMAT, DEFAULT_DATE_FORMAT),
+                ): str,
+                vol.Required(
+                    CONF_MAX_CONCURRENT,
+                    default=options.get(CONF_MAX_CONCURRENT, DEFAULT_MAX_CONCURRENT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+            }
+        )
+        # Only administrators can open the options, so the secret path of
+        # the feed is shown here rather than in a state attribute.
+        return self.async_show_form(
+            step_id="init",
+            data_schema=data_schema,
+            errors=errors,
+            description_placeholders={"feed_path": feed_path(self.config_entry)},
+        )
@@ -2,3 +2,24 @@
 
 DOMAIN = "abfallplus"
 ENTRY_COORDINATOR = "data_coordinator"
+ENTRY_FORMATTER = "formatter"
+ENTRY_APPS = "apps"
+ENTRY_REFRESH = "refresh"
+ENTRY_FEED = "feed"
+DATA_HUB = "abfallplus_hub"
+
+EVENT_SCHEDULE_CHANGED = "abfallplus_schedule_changed"
+SERVICE_UPDATE_SENSORS = "update_sensors"
+ATTR_ENTRY_ID = "entry_id"
+
+CONF_ADDRESSES = "addresses"
+CONF_DATE_FORMAT = "date_format"
+CONF_FEED_TOKEN = "feed_token"
+CONF_LOCALE = "locale"
+CONF_MAX_CONCURRENT = "max_concurrent"
+DEFAULT_DATE_FORMAT = "EEE d. MMM"
+DEFAULT_LOCALE = "de_DE"
+DEFAULT_MAX_CONCURRENT = 4
+
+STORAGE_KEY = "abfallplus.{entry_id}"
+STORAGE_VERSION = 2
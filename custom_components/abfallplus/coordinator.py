@@ -0,0 +1,121 @@
+"""Data update coordinator of an Abfallplus config entry."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .abfallplus_app_lib import PickupSchedule
+from .const import CONF_ADDRESSES, EVENT_SCHEDULE_CHANGED
+
+
+class AbfallplusCoordinator(DataUpdateCoordinator[list[PickupSchedule | None]]):
+    """Coordinator of the schedules of all addresses of an entry.
+
+    The data is one schedule per address. Entities listen with the context
+    (address index, category id), or (address index, None) for all waste
+    types of an address. When new schedules arrive, only the listeners of
+    changed waste types are notified, and listeners without a context.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        logger: logging.Logger,
+        entry: ConfigEntry,
+        *,
+        name: str,
+        update_method: Callable[[], Awaitable[list[PickupSchedule | None]]],
+        update_interval: timedelta,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            logger,
+            name=name,
+            update_method=update_method,
+            update_interval=update_interval,
+        )
+        self.entry = entry
+        # Contexts changed by the data being set, None to notify everyone
+        self._changed: set[tuple] | None = None
+
+    async def _async_update_data(self) -> list[PickupSchedule | None]:
+        """Fetch the schedules and diff them against the current ones."""
+        data = await super()._async_update_data()
+        self._changed = self._async_diff(self.data, data)
+        return data
+
+    @callback
+    def async_set_updated_data(self, data: list[PickupSchedule | None]) -> None:
+        """Take over schedules fetched elsewhere."""
+        self._changed = self._async_diff(self.data, data)
+        super().async_set_updated_data(data)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify the listeners of changed waste types."""
+        changed, self._changed = self._changed, None
+        if changed is None:
+            super().async_update_listeners()
+            return
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                update_callback()
+
+    @callback
+    def _async_diff(
+        self,
+        previous: list[PickupSchedule | None] | None,
+        data: list[PickupSchedule | None],
+    ) -> set[tuple] | None:
+        """Return the changed contexts and fire an event per changed waste type.
+
+        Returns None, so that all listeners are notified, without schedules
+        to compare.
+        """
+        if previous is None:
+            return None
+        changed: set[tuple] = set()
+        addresses = self.entry.data[CONF_ADDRESSES]
+        for index, (address, before, after) in enumerate(
+            zip(addresses, previous, data)
+        ):
+            if before is None or after is None:
+                if before is not after:
+                    changed.add((index, None))
+                    changed.update((index, a["data"]) for a in address["abfallarten"])
+                continue
+            if before == after:
+                continue
+            for abfallart in address["abfallarten"]:
+                added, removed, moved = after.diff(before, abfallart["data"])
+                if not (added or removed or moved):
+                    continue
+                changed.add((index, None))
+                changed.add((index, abfallart["data"]))
+                self.hass.bus.async_fire(
+                    EVENT_SCHEDULE_CHANGED,
+                    self._event_data(address, abfallart, added, removed, moved),
+                )
+        return changed
+
+    def _event_data(self, address, abfallart, added, removed, moved) -> dict[str, Any]:
+        """Return the data of a schedule changed event."""
+        return {
+            "entry_id": self.entry.entry_id,
+            "street": address["street"]["name"],
+            "hnr": address["hnr"]["name"] if address["hnr"] is not None else None,
+            "waste_type": abfallart["name"],
+            "added": [date.isoformat() for date in added],
+            "removed": [date.isoformat() for date in removed],
+            "moved": [
+                {"from": old.isoformat(), "to": new.isoformat()} for old, new in moved
+            ],
+        }
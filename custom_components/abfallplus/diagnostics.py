@@ -0,0 +1,42 @@
+"""Diagnostics support for Abfallplus."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, ENTRY_APPS, ENTRY_COORDINATOR, ENTRY_FORMATTER
+
+TO_REDACT = {"client_id", "cookie", "feed_token"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    apps = data[ENTRY_APPS]
+    coordinator = data[ENTRY_COORDINATOR]
+    formatter = data[ENTRY_FORMATTER]
+
+    return {
+        "entry": async_redact_data(entry.data, TO_REDACT),
+        "options": dict(entry.options),
+        "update_interval": str(coordinator.update_interval),
+        "last_update_success": coordinator.last_update_success,
+        "addresses": [
+            {
+                "version_state": app.version_state,
+                "refresh": app.stats.as_dict(),
+            }
+            for app in apps
+        ],
+        "formatting": {
+            "cache_hits": formatter.cache_hits,
+            "cache_misses": formatter.cache_misses,
+            "last_duration": formatter.last_duration,
+        },
+    }
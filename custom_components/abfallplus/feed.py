@@ -0,0 +1,178 @@
+"""iCalendar feed of the pickup schedules of an Abfallplus entry."""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+from http import HTTPStatus
+import secrets
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .abfallplus_app_lib import PickupSchedule
+from .const import CONF_ADDRESSES, CONF_FEED_TOKEN, DOMAIN, ENTRY_FEED
+
+FEED_URL = "/api/abfallplus/feed/{token}.ics"
+
+# Calendar apps poll often, the schedule changes a few times a year
+FEED_MAX_AGE = 3600
+
+
+def feed_path(entry: ConfigEntry) -> str:
+    """Return the path of the feed of an entry."""
+    return FEED_URL.format(token=entry.data[CONF_FEED_TOKEN])
+
+
+def _escape(text: str) -> str:
+    """Escape a text value."""
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Fold a content line to at most 75 octets per line."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Do not split UTF-8 sequences
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+        limit = 74
+    return "\r\n ".join(parts)
+
+
+class IcsFeed:
+    """ICS body of an entry, built once per version of its schedules."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: DataUpdateCoordinator[list[PickupSchedule | None]],
+        labels: list[str],
+    ) -> None:
+        """Initialize the feed of an entry with the labels of its addresses."""
+        self.hass = hass
+        self.entry = entry
+        self.coordinator = coordinator
+        self.labels = labels
+        self._schedules: list[PickupSchedule | None] | None = None
+        self.body = b""
+        self.etag = ""
+
+    async def async_update(self) -> None:
+        """Build the body again if the schedules changed since the last build.
+
+        Schedules are immutable and replaced when they change, so an
+        identity check suffices.
+        """
+        schedules = self.coordinator.data or [None] * len(self.labels)
+        if self._schedules is None or any(
+            a is not b for a, b in zip(self._schedules, schedules, strict=True)
+        ):
+            self.body, self.etag = await self.hass.async_add_executor_job(
+                self._build, schedules
+            )
+            self._schedules = list(schedules)
+
+    def _build(self, schedules: list[PickupSchedule | None]) -> tuple[bytes, str]:
+        """Return the body and its strong ETag, equal for equal schedules."""
+        addresses = self.entry.data[CONF_ADDRESSES]
+        lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Abfallplus//Home Assistant//DE",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_escape(self.entry.title)}",
+        ]
+        for index, (address, schedule) in enumerate(
+            zip(addresses, schedules, strict=True)
+        ):
+            if schedule is None:
+                continue
+            prefix = f"{self.labels[index]} " if len(addresses) > 1 else ""
+            for abfallart in address["abfallarten"]:
+                summary = _escape(prefix + abfallart["name"])
+                for date in schedule.dates(abfallart["data"]):
+                    day = date.strftime("%Y%m%d")
+                    end = (date + datetime.timedelta(days=1)).strftime("%Y%m%d")
+                    lines += (
+                        "BEGIN:VEVENT",
+                        f"UID:{self.entry.entry_id}-{index}-{abfallart['data']}"
+                        f"-{day}@abfallplus",
+                        # Derived from the event rather than the build time,
+                        # so the body and ETag only change with the schedule
+                        f"DTSTAMP:{day}T000000Z",
+                        f"DTSTART;VALUE=DATE:{day}",
+                        f"DTEND;VALUE=DATE:{end}",
+                        f"SUMMARY:{summary}",
+                        "TRANSP:TRANSPARENT",
+                        "END:VEVENT",
+                    )
+        lines.append("END:VCALENDAR")
+        body = ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode()
+        return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class AbfallplusFeedView(HomeAssistantView):
+    """Serve the ICS feeds of all entries.
+
+    Calendar apps cannot authenticate, so the path contains a secret token
+    per entry instead.
+    """
+
+    url = FEED_URL.replace("{token}", "{token:[A-Za-z0-9_-]+}")
+    name = "api:abfallplus:feed"
+    requires_auth = False
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the view."""
+        self.hass = hass
+
+    async def get(self, request: web.Request, token: str) -> web.Response:
+        """Return the feed of the entry with the token."""
+        feed = None
+        for entry_data in self.hass.data.get(DOMAIN, {}).values():
+            entry_feed: IcsFeed = entry_data[ENTRY_FEED]
+            if secrets.compare_digest(
+                entry_feed.entry.data[CONF_FEED_TOKEN].encode(), token.encode()
+            ):
+                feed = entry_feed
+        if feed is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+
+        await feed.async_update()
+
+        headers = {
+            "ETag": feed.etag,
+            "Cache-Control": f"private, max-age={FEED_MAX_AGE}",
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        if any(
+            tag.strip().removeprefix("W/") in (feed.etag, "*")
+            for tag in if_none_match.split(",")
+        ):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+        return web.Response(
+            body=feed.body,
+            content_type="text/calendar",
+            charset="utf-8",
+            headers=headers,
+        )
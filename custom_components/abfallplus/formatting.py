@@ -0,0 +1,111 @@
+"""Display formatting of Abfallplus pickup dates."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import datetime
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .const import DEFAULT_DATE_FORMAT, DEFAULT_LOCALE
+
+if TYPE_CHECKING:
+    from babel import Locale
+
+FORMAT_CACHE_SIZE = 1024
+
+
+class _FormatCache:
+    """Bounded LRU cache of formatted dates shared by all formatters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._data: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+
+_CACHE = _FormatCache(FORMAT_CACHE_SIZE)
+
+
+class DateFormatter:
+    """Format pickup dates with babel, memoizing the results."""
+
+    def __init__(
+        self, locale: str = DEFAULT_LOCALE, pattern: str = DEFAULT_DATE_FORMAT
+    ) -> None:
+        """Initialize the formatter."""
+        self.locale = locale
+        self.pattern = pattern
+        self._locale: Locale | None = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_duration: float | None = None
+
+    def load_locale(self) -> None:
+        """Import babel and load the locale data, which does blocking I/O.
+
+        Raises ValueError for unknown locales.
+        """
+        # pylint: disable-next=import-outside-toplevel
+        from babel import Locale, UnknownLocaleError
+
+        try:
+            self._locale = Locale.parse(self.locale)
+        except UnknownLocaleError as err:
+            raise ValueError(f"Unknown locale {self.locale}") from err
+
+    def format_cached(
+        self, data: dict[str, list[datetime.date]]
+    ) -> dict[str, list[str]] | None:
+        """Format the dates from the cache only, None if any date is missing."""
+        formatted = {}
+        for key, value in data.items():
+            strings = []
+            for date in value:
+                if (string := _CACHE.get((date, self.locale, self.pattern))) is None:
+                    self.cache_misses += 1
+                    return None
+                self.cache_hits += 1
+                strings.append(string)
+            formatted[key] = strings
+        return formatted
+
+    def format(self, data: dict[str, list[datetime.date]]) -> dict[str, list[str]]:
+        """Format all dates, must be run in the executor on cache misses."""
+        started = time.perf_counter()
+        if self._locale is None:
+            self.load_locale()
+        formatted = {
+            key: [self.format_date(date) for date in value]
+            for key, value in data.items()
+        }
+        self.last_duration = time.perf_counter() - started
+        return formatted
+
+    def format_date(self, date: datetime.date) -> str:
+        """Format a single date."""
+        key = (date, self.locale, self.pattern)
+        if (string := _CACHE.get(key)) is None:
+            # pylint: disable-next=import-outside-toplevel
+            from babel import dates
+
+            string = dates.format_datetime(
+                date, self.pattern, locale=self._locale or self.locale
+            )
+            _CACHE.set(key, string)
+        return string
@@ -0,0 +1,207 @@
+"""Request-coalescing fetch hub shared by all Abfallplus config entries."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import time
+
+import aiohttp
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .abfallplus_app_lib import AbfallplusApp, RateLimitedError
+from .const import DATA_HUB
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fetches completed less than this many seconds ago are served without
+# contacting Abfallplus again.
+FETCH_REUSE_WINDOW = 300
+
+# Failed fetches are retried with exponential backoff; after this many
+# consecutive failures the circuit opens and no requests are sent until
+# the backoff delay has passed.
+BACKOFF_BASE = 60
+BACKOFF_MAX = 6 * 3600
+CIRCUIT_THRESHOLD = 3
+
+
+@callback
+def async_get_hub(hass: HomeAssistant) -> AbfallplusHub:
+    """Return the hub, creating it on first use."""
+    if DATA_HUB not in hass.data:
+        hass.data[DATA_HUB] = AbfallplusHub(hass)
+    return hass.data[DATA_HUB]
+
+
+class _SharedApp:
+    """An AbfallplusApp shared by all entries with the same client and address."""
+
+    def __init__(self, app: AbfallplusApp) -> None:
+        self.app = app
+        self.listeners: list[Callable[[], None]] = []
+        self.task: asyncio.Task | None = None
+        self.last_fetch: float | None = None
+        self.failures = 0
+        self.retry_delay: float = 0.0
+        self.circuit_open_until: float | None = None
+
+
+class AbfallplusHub:
+    """Coalesce identical downloads of several config entries.
+
+    Entries with the same app, address and waste types share one
+    AbfallplusApp, which logs in with the client of the first of them. The
+    API registers address and waste types per client, so configurations
+    differing in any of them cannot share a client. Concurrent fetches join
+    the download in flight, and when the schedule changed all other
+    subscribed entries are notified. All apps share one keep-alive session;
+    the login cookies are kept per app.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        self._apps: dict[tuple, _SharedApp] = {}
+        self._session: aiohttp.ClientSession | None = None
+
+    @staticmethod
+    def key(config) -> tuple:
+        """Return the key identifying the downloads of a configuration.
+
+        The client id is left out, as every config flow registers a client
+        of its own.
+        """
+        return (
+            config["app"]["app_id"],
+            config["app"]["landkreis_id"],
+            config["community"]["data"],
+            config["street"]["data"],
+            config["hnr"]["data"] if config["hnr"] is not None else None,
+            frozenset(a["data"] for a in config["abfallarten"]),
+        )
+
+    @callback
+    def async_subscribe(
+        self, config, listener: Callable[[], None]
+    ) -> tuple[tuple, AbfallplusApp, CALLBACK_TYPE]:
+        """Subscribe to the shared app of a configuration.
+
+        Returns the key, the shared app and a callback to unsubscribe.
+        """
+        key = self.key(config)
+        if (shared := self._apps.get(key)) is None:
+            if self._session is None:
+                # One session on top of Home Assistant's connection pool for
+                # all addresses. It has no cookie jar, as every app sends the
+                # cookies of its own login. It outlives the entry creating it
+                # and is closed when the last address unsubscribes.
+                self._session = async_create_clientsession(
+                    self.hass,
+                    auto_cleanup=False,
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                )
+            shared = _SharedApp(AbfallplusApp(dict(config), session=self._session))
+            self._apps[key] = shared
+        shared.listeners.append(listener)
+
+        @callback
+        def async_unsubscribe() -> None:
+            shared.listeners.remove(listener)
+            if not shared.listeners:
+                self._apps.pop(key, None)
+                if shared.task is not None:
+                    shared.task.cancel()
+                self.hass.async_create_task(shared.app.close())
+            if not self._apps and self._session is not None:
+                self.hass.async_create_task(self._session.close())
+                self._session = None
+
+        return key, shared.app, async_unsubscribe
+
+    async def async_fetch(
+        self, key: tuple, origin: Callable[[], None] | None = None
+    ) -> bool:
+        """Fetch the schedule of a key, joining a download already in flight.
+
+        Returns False if the download failed or the circuit is open.
+        Subscribers other than the origin are notified when the schedule
+        changed.
+        """
+        shared = self._apps[key]
+        if self.circuit_open(key):
+            _LOGGER.debug("Circuit open, not contacting Abfallplus")
+            return False
+        if (
+            shared.task is None
+            and shared.last_fetch is not None
+            and time.monotonic() - shared.last_fetch < FETCH_REUSE_WINDOW
+        ):
+            return True
+        if shared.task is None:
+            shared.task = self.hass.async_create_task(
+                self._async_fetch(shared, origin), f"abfallplus fetch {key[0]}"
+            )
+        return await asyncio.shield(shared.task)
+
+    async def _async_fetch(
+        self, shared: _SharedApp, origin: Callable[[], None] | None
+    ) -> bool:
+        """Download the schedule once for all subscribers."""
+        version_state = shared.app.version_state
+        retry_after = None
+        data = None
+        try:
+            data = await shared.app.get_pickup_times()
+        except RateLimitedError as err:
+            retry_after = err.retry_after or BACKOFF_BASE
+            _LOGGER.warning("Rate limited by Abfallplus, retrying in %s s", retry_after)
+        except Exception:
+            self._record_failure(shared, None)
+            raise
+        finally:
+            shared.task = None
+        if data is None:
+            self._record_failure(shared, retry_after)
+            return False
+        shared.last_fetch = time.monotonic()
+        shared.failures = 0
+        shared.retry_delay = 0.0
+        shared.circuit_open_until = None
+
+        if shared.app.version_state != version_state:
+            for listener in list(shared.listeners):
+                if listener is not origin:
+                    listener()
+        return True
+
+    @staticmethod
+    def _record_failure(shared: _SharedApp, retry_after: float | None) -> None:
+        """Back off after a failed fetch and open the circuit if needed."""
+        shared.failures += 1
+        shared.retry_delay = min(BACKOFF_BASE * 2 ** (shared.failures - 1), BACKOFF_MAX)
+        if retry_after is not None:
+            shared.retry_delay = max(shared.retry_delay, retry_after)
+        if retry_after is not None or shared.failures >= CIRCUIT_THRESHOLD:
+            shared.circuit_open_until = time.monotonic() + shared.retry_delay
+
+    def circuit_open(self, key: tuple) -> bool:
+        """Return True if fetches of a key are skipped after repeated failures."""
+        shared = self._apps[key]
+        return (
+            shared.task is None
+            and shared.circuit_open_until is not None
+            and time.monotonic() < shared.circuit_open_until
+        )
+
+    @callback
+    def async_expire(self, key: tuple) -> None:
+        """Let the next fetch of a key contact Abfallplus despite a recent one."""
+        self._apps[key].last_fetch = None
+
+    def retry_delay(self, key: tuple) -> float:
+        """Return the seconds to wait before fetching a key again after failures."""
+        return self._apps[key].retry_delay
@@ -0,0 +1,48 @@
+"""Prefix search over the lists of the Abfallplus assistant."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+
+_FOLD = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalize(text: str) -> str:
+    """Fold case, umlauts and ß for matching."""
+    return " ".join(text.casefold().translate(_FOLD).split())
+
+
+class SearchIndex:
+    """Normalized prefix index over {"name", "data"} records."""
+
+    __slots__ = ("_keys", "_records", "by_name")
+
+    def __init__(self, records: list[dict]) -> None:
+        """Index the records by their name and by every word of it."""
+        self.by_name = {record["name"]: record for record in records}
+        entries = []
+        for position, record in enumerate(records):
+            words = normalize(record["name"]).split(" ")
+            for index in range(len(words)):
+                # Rank matches of the full name before matches of later words
+                entries.append((" ".join(words[index:]), index, position))
+        entries.sort()
+        self._keys = [entry[0] for entry in entries]
+        self._records = [(entry[1], records[entry[2]]) for entry in entries]
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """Return up to limit records with a name or word starting with query."""
+        query = normalize(query)
+        if not query:
+            return []
+        matches: dict[str, tuple[tuple[int, int, int], dict]] = {}
+        index = bisect_left(self._keys, query)
+        while index < len(self._keys) and self._keys[index].startswith(query):
+            word, record = self._records[index]
+            rank = (self._keys[index] != query, word, len(record["name"]))
+            name = record["name"]
+            if name not in matches or rank < matches[name][0]:
+                matches[name] = (rank, record)
+            index += 1
+        ranked = sorted(matches.values(), key=lambda m: (m[0], m[1]["name"]))
+        return [record for _, record in ranked[:limit]]
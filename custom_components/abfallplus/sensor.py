@@ -2,10 +2,18 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass, replace
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
@@ -13,8 +21,57 @@ from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
 )
+from homeassistant.util import dt as dt_util
+
+from . import address_label
+from .abfallplus_app_lib import PickupSchedule, RefreshStats
+from .const import (
+    CONF_ADDRESSES,
+    DOMAIN,
+    ENTRY_APPS,
+    ENTRY_COORDINATOR,
+    ENTRY_FORMATTER,
+)
+from .formatting import DateFormatter
+
 
-from .const import DOMAIN, ENTRY_COORDINATOR
+@dataclass(frozen=True, kw_only=True)
+class StatsSensorEntityDescription(SensorEntityDescription):
+    """Describes a diagnostic sensor of the refresh statistics."""
+
+    value_fn: Callable[[RefreshStats], Any]
+
+
+STATS_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="last_refresh_duration",
+        name="Letzte Aktualisierung Dauer",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=3,
+        value_fn=lambda stats: stats.last_duration,
+    ),
+    StatsSensorEntityDescription(
+        key="bytes_received",
+        name="Empfangene Daten",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.bytes_received,
+    ),
+    StatsSensorEntityDescription(
+        key="cache_hits",
+        name="Unveränderte Abrufe",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.cache_hits,
+    ),
+    StatsSensorEntityDescription(
+        key="refresh_failures",
+        name="Fehlgeschlagene Abrufe",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.failures,
+    ),
+)
 
 
 async def async_setup_entry(
@@ -25,28 +82,71 @@ async def async_setup_entry(
     """Set up sensors from a config entry created in the integrations UI."""
     entry = hass.data[DOMAIN][config_entry.entry_id]
     coordinator = entry[ENTRY_COORDINATOR]
+    formatter = entry[ENTRY_FORMATTER]
+    addresses = config_entry.data[CONF_ADDRESSES]
 
-    # coordinator = entry[ENTRY_COORDINATOR]
     device_info = DeviceInfo(
         entry_type=DeviceEntryType.SERVICE,
         identifiers={(DOMAIN, "abfallplus")},
         manufacturer="Abfallplus",
         name="Abfallplus",
     )
-    async_add_entities(
-        [
-            WasteSensor(
+    entities: list[SensorEntity] = []
+    for index, address in enumerate(addresses):
+        # The first address keeps the ids and names of single address entries
+        suffix = f"_{index}" if index else ""
+        prefix = f"{address_label(address)} " if len(addresses) > 1 else ""
+        for waster_type in address["abfallarten"]:
+            entities.append(
+                WasteSensor(
+                    coordinator,
+                    device_info,
+                    SensorEntityDescription(
+                        key=f"{waster_type['name']}{suffix}",
+                        name=f"{prefix}{waster_type['name']}",
+                        icon="mdi:trash-can",
+                    ),
+                    f"{config_entry.entry_id}_{waster_type['name']}{suffix}",
+                    index,
+                    waster_type["data"],
+                    formatter,
+                )
+            )
+            entities.append(
+                WasteDaysSensor(
+                    coordinator,
+                    device_info,
+                    SensorEntityDescription(
+                        key=f"{waster_type['name']}{suffix}",
+                        name=f"{prefix}{waster_type['name']} Tage",
+                        icon="mdi:calendar-clock",
+                        native_unit_of_measurement=UnitOfTime.DAYS,
+                    ),
+                    f"{config_entry.entry_id}_{waster_type['name']}{suffix}_days",
+                    index,
+                    waster_type["data"],
+                )
+            )
+        entities.extend(
+            StatsSensor(
                 coordinator,
                 device_info,
-                SensorEntityDescription(
-                    key=waster_type["name"],
-                    name=waster_type["name"],
-                    icon="mdi:trash-can",
-                ),
+                replace(description, name=f"{prefix}{description.name}"),
+                f"{config_entry.entry_id}{suffix}_{description.key}",
+                entry[ENTRY_APPS][index].stats,
             )
-            for waster_type in config_entry.data["abfallarten"]
-        ]
-    )
+            for description in STATS_SENSORS
+        )
+    async_add_entities(entities)
+
+
+def _schedule(
+    coordinator: DataUpdateCoordinator, address: int
+) -> PickupSchedule | None:
+    """Return the schedule of an address from the coordinator data."""
+    if coordinator.data is None:
+        return None
+    return coordinator.data[address]
 
 
 class WasteSensor(CoordinatorEntity, SensorEntity):
@@ -60,38 +160,134 @@ class WasteSensor(CoordinatorEntity, SensorEntity):
         coordinator: DataUpdateCoordinator,
         device_info: DeviceInfo,
         description: SensorEntityDescription,
+        unique_id: str,
+        address: int,
+        category: str,
+        formatter: DateFormatter,
     ) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator, context=description.key)
+        super().__init__(coordinator, context=(address, category))
         self._attr_device_info = device_info
         self.entity_description = description
-        self._attr_unique_id = description.key
+        self._attr_unique_id = unique_id
+        self._address = address
+        self._category = category
+        self._formatter = formatter
 
         #  Set initial data
-        self._attr_native_value = self.coordinator.data[self.entity_description.key][0]
-        self._attributes = {
-            "übernächstes Mal": self.coordinator.data[self.entity_description.key][1]
-        }
+        self._attr_native_value = None
+        self._attributes = {"übernächstes Mal": None}
+        self._update_from_data()
+        # Value and availability as written when the entity is added. The
+        # coordinator has already updated its success when it calls the
+        # listeners, so the availability must be compared to the written one.
+        self._written_state = (
+            self._attr_native_value,
+            self._attributes,
+            self.available,
+        )
+
+    def _update_from_data(self) -> None:
+        """Take the next two pickup dates from the coordinator data."""
+
+        if (schedule := _schedule(self.coordinator, self._address)) is None:
+            return
+        dates = [
+            self._formatter.format_date(d)
+            for d in schedule.next_k(self._category, 2, dt_util.now().date())
+        ]
+        self._attr_native_value = dates[0] if len(dates) > 0 else None
+        self._attributes = {"übernächstes Mal": dates[1] if len(dates) > 1 else None}
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
 
-        if (
-            self.coordinator.data is not None
-            and len(self.coordinator.data[self.entity_description.key]) >= 2
-        ):
-            self._attr_native_value = self.coordinator.data[
-                self.entity_description.key
-            ][0]
-            self._attributes = {
-                "übernächstes Mal": self.coordinator.data[self.entity_description.key][
-                    1
-                ]
-            }
+        self._update_from_data()
+        state = (self._attr_native_value, self._attributes, self.available)
+        if state != self._written_state:
+            self._written_state = state
             self.async_write_ha_state()
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return the state attributes of the binary sensor."""
         return self._attributes
+
+
+class WasteDaysSensor(CoordinatorEntity, SensorEntity):
+    """Days until the next pickup of a waste type."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        device_info: DeviceInfo,
+        description: SensorEntityDescription,
+        unique_id: str,
+        address: int,
+        category: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, context=(address, category))
+        self._attr_device_info = device_info
+        self.entity_description = description
+        self._attr_unique_id = unique_id
+        self._address = address
+        self._category = category
+
+        self._attr_native_value = None
+        self._update_from_data()
+        self._written_state = (self._attr_native_value, self.available)
+
+    def _update_from_data(self) -> None:
+        """Count the days until the next pickup date."""
+
+        if (schedule := _schedule(self.coordinator, self._address)) is None:
+            return
+        self._attr_native_value = schedule.days_until(
+            self._category, dt_util.now().date()
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+
+        self._update_from_data()
+        state = (self._attr_native_value, self.available)
+        if state != self._written_state:
+            self._written_state = state
+            self.async_write_ha_state()
+
+
+class StatsSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor of the refresh statistics."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    entity_description: StatsSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        device_info: DeviceInfo,
+        description: StatsSensorEntityDescription,
+        unique_id: str,
+        stats: RefreshStats,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_device_info = device_info
+        self.entity_description = description
+        self._attr_unique_id = unique_id
+        self._stats = stats
+
+    @property
+    def native_value(self) -> Any:
+        """Return the current value of the statistic."""
+        return self.entity_description.value_fn(self._stats)